@@ -1,12 +1,13 @@
 import streamlit as st
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from job_rag import JobRAG
 import time
 import PyPDF2
 import docx
-import requests
 from user_manager import UserManager
 import config
+import metrics
 
 # Page configuration
 st.set_page_config(
@@ -54,10 +55,50 @@ def extract_text_from_docx(docx_file):
         st.error(f"Error reading DOCX: {e}")
         return ""
 
+@st.cache_resource
+def get_executor():
+    """Worker threads shared by all sessions for search stages"""
+    return ThreadPoolExecutor(max_workers=8)
+
+@st.cache_resource
+def get_analysis_executor():
+    """Separate, bounded threads for the long streamed analyses so they never hold up searches"""
+    return ThreadPoolExecutor(max_workers=config.ANALYSIS_WORKERS, thread_name_prefix='analysis')
+
+def run_analysis(rag, query_text, jobs_df, skills, buffer):
+    """Background worker: collect the streamed analysis into buffer (a list of text chunks)"""
+    for chunk in rag.generate_response_stream(query_text, jobs_df, skills):
+        buffer.append(chunk)
+    return "".join(buffer)
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def load_job_description(job_id):
+    return st.session_state.rag.job_description(job_id)
+
+@st.fragment(run_every=1)
+def show_analysis_progress():
+    """Re-renders once a second with the partial analysis until the worker finishes"""
+    future = st.session_state.get('ai_future')
+    if future is None:
+        return
+    if future.done():
+        try:
+            st.session_state.ai_analysis = future.result()
+        except Exception as e:
+            st.session_state.ai_analysis = f"Analysis unavailable: {e}"
+        st.session_state.ai_future = None
+        st.rerun()
+    partial = "".join(st.session_state.ai_buffer)
+    st.info(f"**🤖 AI Analysis:**\n\n{partial or 'AI is analyzing your job matches...'} ▌")
+
+@st.cache_resource
+def get_services():
+    """One JobRAG/UserManager per process; they share db.get_engine's connection pool"""
+    return JobRAG(), UserManager()
+
 # Initialize State
 if 'rag' not in st.session_state:
-    st.session_state.rag = JobRAG()
-    st.session_state.user_manager = UserManager()
+    st.session_state.rag, st.session_state.user_manager = get_services()
 
 if 'search_history' not in st.session_state:
     st.session_state.search_history = []
@@ -156,7 +197,8 @@ with st.sidebar:
                 st.session_state.user['id'],
                 uploaded_file.name,
                 uploaded_file.getvalue(),  # Get file as bytes for BLOB
-                list(resume_skills)
+                list(resume_skills),
+                resume_text
             )
         
         st.success(f"Resume Saved: {len(resume_skills)} skills found")
@@ -170,11 +212,27 @@ with st.sidebar:
     try:
         with st.session_state.rag.engine.connect() as conn:
             st.success("Database: Connected")
-        requests.get("http://localhost:11434", timeout=1)
-        st.success("Ollama: Online")
+        # Circuit state kept by the client; pinging hosts here would slow every rerun
+        ollama = st.session_state.rag.ollama
+        ollama_status = ollama.endpoint_status()
+        online = sum(ollama_status.values())
+        if online == len(ollama_status):
+            st.success(f"Ollama: Online ({online} host{'s' if online != 1 else ''})")
+        elif online:
+            st.warning(f"Ollama: {online}/{len(ollama_status)} hosts online")
+        elif ollama.any_available():
+            st.warning("Ollama: Offline, retrying")
+        else:
+            st.error("Ollama: Offline")
     except Exception:
         st.error("System Status: Connection Issues")
 
+    # Per-stage latency since this process started (see metrics.py)
+    latency = metrics.snapshot()
+    if latency:
+        with st.expander("⏱️ Search Latency"):
+            st.dataframe(pd.DataFrame(latency).T[['count', 'p50_ms', 'p95_ms', 'p99_ms']].round(0))
+
 # Main Content
 st.markdown('<h1 class="main-header">🎯 Job Recommender System</h1>', unsafe_allow_html=True)
 
@@ -208,8 +266,6 @@ with tab1:
                 'skills': list(resume_skills) if resume_skills else [],
                 'email_notifications': True
             }
-            st.session_state.user_manager.save_user_preferences(st.session_state.user['id'], preferences)
-            
             # Process inputs
             final_skills = {s.strip() for s in skills_input.split(',')} if skills_input else set()
             
@@ -223,16 +279,40 @@ with tab1:
             parts = []
             if role_val: parts.append(f"{role_val} jobs")
             if loc_val: parts.append(f"in {loc_val}")
-            if final_skills: parts.append(f"using {', '.join(list(final_skills)[:5])}")
+            if final_skills: parts.append(f"using {', '.join(sorted(final_skills)[:5])}")
             
             query_text = " ".join(parts) if parts else "Software Engineering jobs"
             
             with st.spinner(f"Searching for: {query_text}..."):
-                result = st.session_state.rag.search_jobs(query_text, filters)
+                rag = st.session_state.rag
+                executor = get_executor()
+                # The preference write runs alongside the search
+                save_future = executor.submit(
+                    st.session_state.user_manager.save_user_preferences,
+                    st.session_state.user['id'], preferences
+                )
+                # Stored resume/profile vector, if these preferences match what it was built from;
+                # it was embedded with the saved skills, so skills edited in the box miss it
+                profile_embedding = st.session_state.user_manager.get_profile_embedding(
+                    st.session_state.user['id'], {**preferences, 'skills': final_skills}
+                )
+                # Without one the query is embedded; past EMBEDDING_BUDGET_MS the full-text
+                # results are served instead. Descriptions load on demand below
+                result = rag.search_jobs(query_text, filters, include_description=False,
+                                         query_embedding=profile_embedding)
+                save_future.result()  # DB write only; the profile re-embed runs in the background
+
                 st.session_state.last_results = result
                 st.session_state.last_search_skills = final_skills
                 st.session_state.last_query = query_text
                 st.session_state.ai_analysis = None # Reset cache for new search
+                # AI analysis runs in the background while the results render
+                st.session_state.ai_buffer = []
+                st.session_state.ai_future = None
+                if not result.empty:
+                    st.session_state.ai_future = get_analysis_executor().submit(
+                        run_analysis, rag, query_text, result, final_skills, st.session_state.ai_buffer
+                    )
                 
     # AI Analysis Section - show before results
     if 'last_results' in st.session_state and not st.session_state.last_results.empty:
@@ -242,12 +322,17 @@ with tab1:
         final_skills = st.session_state.get('last_search_skills', set())
         query_text = st.session_state.get('last_query', 'job search')
         
-        # Only run AI if not already cached
-        if st.session_state.get('ai_analysis') is None:
-            with st.spinner("AI is analyzing your job matches..."):
-                st.session_state.ai_analysis = st.session_state.rag.generate_response(query_text, jobs_df, final_skills)
-        
-        st.info(f"**🤖 AI Analysis:**\n\n{st.session_state.ai_analysis}")
+        # Job cards render right away; the analysis fills in from the background worker
+        if st.session_state.get('ai_analysis') is not None:
+            st.info(f"**🤖 AI Analysis:**\n\n{st.session_state.ai_analysis}")
+        elif st.session_state.get('ai_future') is not None:
+            show_analysis_progress()
+        else:
+            st.session_state.ai_buffer = []
+            st.session_state.ai_future = get_analysis_executor().submit(
+                run_analysis, st.session_state.rag, query_text, jobs_df, final_skills, st.session_state.ai_buffer
+            )
+            show_analysis_progress()
         
         st.divider()
                 
@@ -289,9 +374,9 @@ with tab1:
                     st.markdown("**✅ Matched Skills:**")
                     st.caption(", ".join(job['matched_skills']))
                 
-                # Description Expander
-                with st.expander("Show Job Description"):
-                    st.markdown(job['description'])
+                # Description is fetched only when the reader opens it
+                if st.toggle("Show Job Description", key=f"desc_{job['id']}"):
+                    st.markdown(load_job_description(job['id']) or "No description available.")
                 
                 # Action Buttons
                 col1, col2, col3 = st.columns([1, 1, 3])
@@ -0,0 +1,263 @@
+import argparse
+import asyncio
+import time
+import pandas as pd
+from sqlalchemy import text
+import config
+import metrics
+import vector_storage
+from db import get_async_engine
+from job_rag import JobRAG, DETAIL_COLUMNS, LLM_OPTIONS
+from ollama_client import AsyncOllamaClient
+
+
+class AsyncJobRAG:
+    """JobRAG for event loops: asyncpg and httpx for I/O, JobRAG's query building and scoring"""
+
+    def __init__(self, db_url=None, ollama_url=None):
+        # Candidate SQL, scoring, prompts and the shared caches come from the sync JobRAG;
+        # its engine only serves the occasional cache bookkeeping, in worker threads
+        self.rag = JobRAG(db_url)
+        self.engine = get_async_engine(db_url)
+        self.ollama = AsyncOllamaClient([ollama_url] if ollama_url else None)
+        self._background = set()
+
+    async def aclose(self):
+        await self.ollama.aclose()
+
+    async def within_budget(self, coro, budget_ms):
+        """Await coro for at most budget_ms (0 = no limit); on timeout it keeps running and fills the caches"""
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        if not budget_ms:
+            return await task
+        return await asyncio.wait_for(asyncio.shield(task), budget_ms / 1000)
+
+    async def search_model(self):
+        if not self.rag.next_model:
+            return self.rag.embedding_model
+        return await asyncio.to_thread(self.rag.search_model)
+
+    async def get_embedding(self, text, model=None):
+        try:
+            return await self.ollama.embed(text, model or self.rag.embedding_model, timeout=30)
+        except Exception as e:
+            print(f"Embedding error: {e}")
+            return None
+
+    async def embed_query(self, query, model=None):
+        """Query embedding via the shared LRU, then the shared table, then Ollama"""
+        model = model or self.rag.embedding_model
+        key = (model, self.rag.normalize_query(query))
+        embedding = self.rag.query_cache.get(key)
+        if embedding is not None:
+            return embedding
+
+        if config.QUERY_CACHE_PERSIST:
+            embedding = await asyncio.to_thread(self.rag._load_query_embedding, *key)
+            if embedding is not None:
+                self.rag.query_cache.set(key, embedding)
+                return embedding
+
+        with metrics.span("embedding"):
+            embedding = await self.get_embedding(query, model)
+        if embedding is not None:
+            self.rag.query_cache.set(key, embedding)
+            if config.QUERY_CACHE_PERSIST:
+                await asyncio.to_thread(self.rag._store_query_embedding, *key, embedding)
+        return embedding
+
+    async def embed_query_within(self, query, model=None, budget_ms=None):
+        budget_ms = config.EMBEDDING_BUDGET_MS if budget_ms is None else budget_ms
+        try:
+            return await self.within_budget(self.embed_query(query, model), budget_ms)
+        except asyncio.TimeoutError:
+            print(f"Embedding missed its {budget_ms} ms budget; using full-text results")
+            metrics.record("embedding_budget_miss", budget_ms)
+            return None
+
+    async def search_jobs(self, query, filters=None, limit=20, scoring=None, include_description=True,
+                          with_timings=False, query_embedding=None, budget_ms=None):
+        """JobRAG.search_jobs on the event loop"""
+        if with_timings:
+            with metrics.collect() as timings:
+                jobs_df = await self.search_jobs(query, filters, limit, scoring, include_description,
+                                                 query_embedding=query_embedding, budget_ms=budget_ms)
+            return jobs_df, timings
+
+        rag = self.rag
+        with metrics.span("search"):
+            filters = filters or {}
+            scoring = scoring or config.SEARCH_SCORING
+            model = await self.search_model()
+            if model != rag.embedding_model:
+                query_embedding = None  # profile vectors are from EMBEDDING_MODEL
+            # Refreshes the ingest generation so result_key() reads it from memory
+            await rag.ingest_generation.current_async(self.engine)
+            cache_key = rag.result_key(query, filters, limit, scoring, model, include_description, query_embedding)
+            cached = rag.result_cache.get(cache_key)
+            if cached is not None:
+                return cached.copy()
+
+            if query_embedding is None:
+                query_embedding = await self.embed_query_within(query, model, budget_ms)
+            jobs_df = await self._search_jobs(query, query_embedding, model, filters, limit, scoring)
+            jobs_df = await self.attach_details(jobs_df, include_description)
+            # Degraded (full-text only) results are not cached so they are replaced once Ollama is back
+            if query_embedding is not None:
+                rag.result_cache.set(cache_key, jobs_df.copy())
+            return jobs_df
+
+    async def search_jobs_lexical(self, query, filters=None, limit=20, scoring=None, include_description=True):
+        jobs_df = await self._search_jobs(query, None, await self.search_model(), filters or {}, limit,
+                                          scoring or config.SEARCH_SCORING)
+        return await self.attach_details(jobs_df, include_description)
+
+    async def _search_jobs(self, query, query_embedding, model, filters, limit, scoring):
+        rag = self.rag
+        user_skills = filters.get('resume_skills', set())
+        if not user_skills:
+            user_skills = rag.extract_skills(query)
+
+        multiplier = config.SQL_CANDIDATE_MULTIPLIER if scoring == 'sql' else config.CANDIDATE_MULTIPLIER
+        params = {"limit": limit * multiplier}
+        candidate_sql = rag._candidate_sql(query, query_embedding, model, filters, params)
+
+        if scoring == 'sql':
+            stmt, params = rag._sql_scoring(candidate_sql, params, filters, user_skills, limit)
+        else:
+            stmt = candidate_sql
+
+        async with self.engine.connect() as conn:
+            with metrics.span("sql"):
+                if query_embedding:
+                    await conn.execute(text(vector_storage.SEARCH_PARAMS_SQL), vector_storage.search_params())
+                result = await conn.execute(text(stmt), params)
+                rows = result.fetchall()
+            with metrics.span("dataframe"):
+                jobs_df = pd.DataFrame(rows, columns=list(result.keys()))
+
+        if jobs_df.empty:
+            return pd.DataFrame()
+        if scoring == 'sql':
+            return jobs_df
+        with metrics.span("scoring"):
+            return rag.score_jobs(jobs_df, filters, user_skills, limit)
+
+    async def job_details(self, ids, include_description=True):
+        columns = DETAIL_COLUMNS + (", description" if include_description else "")
+        with metrics.span("details"):
+            async with self.engine.connect() as conn:
+                result = await conn.execute(
+                    text(f"SELECT id, {columns} FROM jobs WHERE id = ANY(CAST(:ids AS uuid[]))"),
+                    {"ids": [str(job_id) for job_id in ids]}
+                )
+                return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+    async def attach_details(self, jobs_df, include_description=True):
+        if jobs_df.empty:
+            return jobs_df
+        details = await self.job_details(jobs_df['id'], include_description)
+        overlap = [column for column in details.columns if column != 'id' and column in jobs_df.columns]
+        return jobs_df.drop(columns=overlap).merge(details, on='id', how='left')
+
+    async def job_description(self, job_id):
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                text("SELECT description FROM jobs WHERE id = CAST(:id AS uuid)"),
+                {"id": str(job_id)}
+            )
+            return result.scalar()
+
+    async def _generate(self, prompt):
+        with metrics.span("llm"):
+            response = await self.ollama.generate(prompt, config.LLM_MODEL, options=LLM_OPTIONS, timeout=200)
+        if response and self.rag.llm_cache:
+            await asyncio.to_thread(self.rag.llm_cache.set, config.LLM_MODEL, LLM_OPTIONS, prompt, response)
+        return response
+
+    async def generate_response(self, query, jobs_df, user_skills=None, budget_ms=None):
+        """JobRAG.generate_response on the event loop"""
+        if jobs_df.empty:
+            return "No jobs found matching your criteria."
+
+        prompt = self.rag._analysis_prompt(jobs_df, user_skills or set())
+        cached = await asyncio.to_thread(self.rag._cached_analysis, prompt)
+        if cached:
+            return cached
+        budget_ms = config.LLM_BUDGET_MS if budget_ms is None else budget_ms
+        try:
+            response = await self.within_budget(self._generate(prompt), budget_ms)
+            return response or "Analysis unavailable."
+        except asyncio.TimeoutError:
+            print(f"LLM missed its {budget_ms} ms budget; using the template analysis")
+            metrics.record("llm_budget_miss", budget_ms)
+            return self.rag._fallback_analysis(jobs_df)
+        except Exception as e:
+            print(f"LLM Error: {e}")
+            return self.rag._fallback_analysis(jobs_df)
+
+    async def chat(self, query, filters=None, with_timings=False, budget_ms=None):
+        """JobRAG.chat on the event loop"""
+        if with_timings:
+            with metrics.collect() as timings:
+                result = await self.chat(query, filters, budget_ms=budget_ms)
+            result["timings"] = timings
+            return result
+        budget_ms = config.CHAT_BUDGET_MS if budget_ms is None else budget_ms
+        start = time.perf_counter()
+        try:
+            filters = filters or {}
+            embedding_budget = config.EMBEDDING_BUDGET_MS
+            if budget_ms:
+                embedding_budget = min(embedding_budget or budget_ms, budget_ms)
+            jobs = await self.search_jobs(query, filters, budget_ms=embedding_budget)
+
+            if jobs.empty:
+                return {"response": "No relevant jobs found matching your criteria.", "jobs": []}
+
+            user_skills = filters.get('resume_skills', set())
+            if not user_skills:
+                user_skills = self.rag.extract_skills(query)
+
+            llm_budget = config.LLM_BUDGET_MS
+            if budget_ms:
+                remaining = max(budget_ms - (time.perf_counter() - start) * 1000, 1)
+                llm_budget = min(llm_budget or remaining, remaining)
+            response = await self.generate_response(query, jobs, user_skills, budget_ms=llm_budget)
+            return {
+                "response": response,
+                "jobs": jobs.to_dict('records')
+            }
+        except Exception as e:
+            return {"response": f"Error: {str(e)}", "jobs": []}
+
+
+async def _bench(queries, concurrency):
+    rag = AsyncJobRAG()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(query):
+        async with semaphore:
+            return await rag.search_jobs(query, include_description=False)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one(query) for query in queries))
+    elapsed = time.perf_counter() - start
+    await rag.aclose()
+    print(f"{len(results)} searches, concurrency {concurrency}: {elapsed:.2f} s "
+          f"({len(results) / elapsed:.1f} searches/s)")
+    metrics.report()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Concurrent async search benchmark')
+    parser.add_argument('queries', nargs='*', default=['data scientist jobs', 'java developer in pune',
+                                                       'devops engineer using aws, kubernetes'])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=50)
+    args = parser.parse_args()
+    # Distinct suffixes keep the result cache from answering every repeat
+    queries = [f"{query} {i}" for i in range(args.repeat) for query in args.queries]
+    asyncio.run(_bench(queries, args.concurrency))
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import text
+
+
+class TTLCache:
+    """Thread-safe bounded LRU cache whose entries expire after `ttl` seconds"""
+
+    def __init__(self, maxsize=1024, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or (self.ttl and time.monotonic() - entry[1] > self.ttl):
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._data),
+                "maxsize": self.maxsize
+            }
+
+
+class IngestGeneration:
+    """Counter the pipeline bumps after each ingest; anything cached under an older value is stale"""
+
+    def __init__(self, check_interval=30):
+        self.check_interval = check_interval
+        self.value = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _due(self):
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.check_interval:
+                return False
+            self._checked_at = time.monotonic()
+            return True
+
+    def current(self, engine):
+        """Latest generation, read from the database at most every `check_interval` seconds"""
+        if not self._due():
+            return self.value
+        try:
+            with engine.connect() as conn:
+                value = conn.execute(text("SELECT generation FROM ingest_state")).scalar()
+        except Exception as e:
+            print(f"Ingest generation read error: {e}")
+            return self.value
+        with self._lock:
+            self.value = value
+        return value
+
+    async def current_async(self, engine):
+        """current() for an AsyncEngine"""
+        if not self._due():
+            return self.value
+        try:
+            async with engine.connect() as conn:
+                value = (await conn.execute(text("SELECT generation FROM ingest_state"))).scalar()
+        except Exception as e:
+            print(f"Ingest generation read error: {e}")
+            return self.value
+        with self._lock:
+            self.value = value
+        return value
+
+    @staticmethod
+    def bump(engine):
+        with engine.begin() as conn:
+            return conn.execute(text("""
+                INSERT INTO ingest_state (id, generation, updated_at) VALUES (TRUE, 1, NOW())
+                ON CONFLICT (id) DO UPDATE SET
+                    generation = ingest_state.generation + 1,
+                    updated_at = NOW()
+                RETURNING generation
+            """)).scalar()
+
+
+class LLMResponseCache:
+    """LLM responses in PostgreSQL keyed by (model, options, prompt); evicted by age and count"""
+
+    def __init__(self, engine, maxsize=5000, ttl=604800):
+        self.engine = engine
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+    @staticmethod
+    def key(model, options, prompt):
+        payload = json.dumps([model, options or {}, prompt], sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, model, options, prompt):
+        try:
+            with self.engine.begin() as conn:
+                return conn.execute(text("""
+                    UPDATE llm_response_cache SET last_used_at = NOW()
+                    WHERE cache_key = :key
+                      AND created_at > NOW() - make_interval(secs => :ttl)
+                    RETURNING response
+                """), {"key": self.key(model, options, prompt), "ttl": self.ttl}).scalar()
+        except Exception as e:
+            print(f"LLM cache read error: {e}")
+            return None
+
+    def set(self, model, options, prompt, response):
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(text("""
+                    INSERT INTO llm_response_cache (cache_key, model, response, created_at, last_used_at)
+                    VALUES (:key, :model, :response, NOW(), NOW())
+                    ON CONFLICT (cache_key) DO UPDATE SET
+                        response = EXCLUDED.response,
+                        created_at = NOW(),
+                        last_used_at = NOW()
+                """), {"key": self.key(model, options, prompt), "model": model, "response": response})
+                self._evict(conn)
+        except Exception as e:
+            print(f"LLM cache write error: {e}")
+
+    def _evict(self, conn):
+        """Drop expired entries, then the least recently used beyond maxsize"""
+        conn.execute(text("""
+            DELETE FROM llm_response_cache
+            WHERE created_at < NOW() - make_interval(secs => :ttl)
+        """), {"ttl": self.ttl})
+        conn.execute(text("""
+            DELETE FROM llm_response_cache
+            WHERE cache_key IN (
+                SELECT cache_key FROM llm_response_cache
+                ORDER BY last_used_at DESC
+                OFFSET :maxsize
+            )
+        """), {"maxsize": self.maxsize})
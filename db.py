@@ -0,0 +1,97 @@
+import threading
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+import config
+
+_engines = {}
+_async_engines = {}
+_lock = threading.Lock()
+
+# asyncpg takes and returns these as text, like psycopg2: uuids as str, pgvector values as '[...]'
+TEXT_CODEC_TYPES = (("uuid", "pg_catalog"), ("vector", "public"), ("halfvec", "public"))
+
+
+def engine_options(url, statement_timeout):
+    """Pool and connection settings shared by every engine in the process"""
+    connect_args = {}
+    if statement_timeout and url.startswith("postgresql+asyncpg:"):
+        connect_args["server_settings"] = {"statement_timeout": str(int(statement_timeout))}
+    elif statement_timeout:
+        connect_args["options"] = f"-c statement_timeout={int(statement_timeout)}"
+    if url.startswith("postgresql+psycopg:") and config.DB_PREPARE_THRESHOLD:
+        # psycopg 3 prepares a statement server-side after it has run this many times
+        connect_args["prepare_threshold"] = config.DB_PREPARE_THRESHOLD
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+
+
+def get_engine(url=None, statement_timeout=None):
+    """Process-wide engine per (url, statement timeout); statement_timeout=0 disables it
+    for maintenance work such as index builds and full exports"""
+    url = url or config.DB_URL
+    if statement_timeout is None:
+        statement_timeout = config.DB_STATEMENT_TIMEOUT_MS
+    key = (url, statement_timeout)
+    with _lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = create_engine(url, **engine_options(url, statement_timeout))
+            _engines[key] = engine
+        return engine
+
+
+def async_url(url):
+    """The same database through the asyncpg driver"""
+    return make_url(url).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+
+async def _text_codecs(conn):
+    for type_name, schema in TEXT_CODEC_TYPES:
+        try:
+            await conn.set_type_codec(type_name, schema=schema, encoder=str, decoder=str, format="text")
+        except ValueError:
+            pass  # halfvec needs pgvector 0.7+
+
+
+def get_async_engine(url=None, statement_timeout=None):
+    """get_engine() for asyncio code: an asyncpg engine with the same pool settings.
+    Pooled connections belong to the event loop that opened them."""
+    # Needs greenlet; imported here so the sync modules do not
+    from sqlalchemy.ext.asyncio import create_async_engine
+    url = async_url(url or config.DB_URL)
+    if statement_timeout is None:
+        statement_timeout = config.DB_STATEMENT_TIMEOUT_MS
+    key = (url, statement_timeout)
+    with _lock:
+        engine = _async_engines.get(key)
+        if engine is None:
+            engine = create_async_engine(url, **engine_options(url, statement_timeout))
+
+            @event.listens_for(engine.sync_engine, "connect")
+            def register_codecs(dbapi_connection, connection_record):
+                dbapi_connection.run_async(_text_codecs)
+
+            _async_engines[key] = engine
+        return engine
+
+
+async def dispose_async_engines():
+    with _lock:
+        engines = list(_async_engines.values())
+        _async_engines.clear()
+    for engine in engines:
+        await engine.dispose()
+
+
+def dispose_engines():
+    """Close every pooled connection, e.g. after forking worker processes"""
+    with _lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
@@ -0,0 +1,164 @@
+import argparse
+import re
+import time
+from sqlalchemy import text
+import config
+from db import get_engine
+from ollama_client import OllamaClient, get_client
+
+
+def index_name(model):
+    """Per-model partial HNSW index name on job_embeddings"""
+    return "idx_job_embeddings_" + re.sub(r'[^a-z0-9]+', '_', model.lower()).strip('_')
+
+
+def model_coverage(engine, model):
+    """Fraction of jobs with an up-to-date embedding for model"""
+    with engine.connect() as conn:
+        row = conn.execute(text("""
+            SELECT COUNT(je.job_id)::float / NULLIF(COUNT(*), 0)
+            FROM jobs j
+            LEFT JOIN job_embeddings je
+              ON je.job_id = j.id AND je.model = :model AND je.content_hash = j.content_hash
+        """), {"model": model}).fetchone()
+    return row[0] or 0.0
+
+
+class EmbeddingMigrator:
+    def __init__(self, model=None, dim=None, db_url=None, ollama_url=None):
+        self.engine = get_engine(db_url, statement_timeout=0)  # index builds run long
+        self.ollama = OllamaClient([ollama_url]) if ollama_url else get_client()
+        self.model = model or config.NEXT_EMBEDDING_MODEL
+        self.dim = dim or config.NEXT_EMBEDDING_DIM
+        if not self.model:
+            raise ValueError("No target model: set NEXT_EMBEDDING_MODEL or pass --model")
+
+    def get_embedding(self, text):
+        return self.ollama.embed(text, self.model, timeout=60)
+
+    def pending_jobs(self, limit, exclude=()):
+        """Jobs with no embedding for the target model, or one computed from stale text"""
+        with self.engine.connect() as conn:
+            result = conn.execute(text("""
+                SELECT j.id, j.title, j.description, j.content_hash
+                FROM jobs j
+                LEFT JOIN job_embeddings je ON je.job_id = j.id AND je.model = :model
+                WHERE (je.job_id IS NULL OR je.content_hash IS DISTINCT FROM j.content_hash)
+                  AND NOT (j.id = ANY(CAST(:exclude AS uuid[])))
+                ORDER BY j.posted_date DESC
+                LIMIT :limit
+            """), {"model": self.model, "limit": limit, "exclude": [str(job_id) for job_id in exclude]})
+            return [dict(row._mapping) for row in result]
+
+    def embed_job(self, job):
+        try:
+            embedding = self.get_embedding(f"{job['title']} {job['description'] or ''}")
+            with self.engine.begin() as conn:
+                conn.execute(text("""
+                    INSERT INTO job_embeddings (job_id, model, embedding, content_hash, updated_at)
+                    VALUES (:job_id, :model, :embedding, :content_hash, NOW())
+                    ON CONFLICT (job_id, model) DO UPDATE SET
+                        embedding = EXCLUDED.embedding,
+                        content_hash = EXCLUDED.content_hash,
+                        updated_at = NOW()
+                """), {
+                    "job_id": job["id"],
+                    "model": self.model,
+                    "embedding": str(embedding),
+                    "content_hash": job["content_hash"]
+                })
+            return True
+        except Exception as e:
+            print(f"ERROR ({job['title'][:30]}): {e}")
+            return False
+
+    def run(self, rate=None, batch_size=50, limit=None):
+        """Backfill the target model at no more than `rate` jobs per second"""
+        rate = rate or config.MIGRATION_RATE
+        done = 0
+        failed = set()  # skipped for the rest of this run so they are not retried forever
+        while limit is None or done < limit:
+            size = batch_size if limit is None else min(batch_size, limit - done)
+            jobs = self.pending_jobs(size, exclude=failed)
+            if not jobs:
+                break
+            embedded = 0
+            for job in jobs:
+                start = time.monotonic()
+                if self.embed_job(job):
+                    embedded += 1
+                else:
+                    failed.add(job["id"])
+                elapsed = time.monotonic() - start
+                if elapsed < 1.0 / rate:
+                    time.sleep(1.0 / rate - elapsed)
+            done += embedded
+            print(f"[{self.model}] {done} embedded, {len(failed)} failed, "
+                  f"coverage {model_coverage(self.engine, self.model):.1%}")
+            if not embedded:
+                print(f"[{self.model}] No progress in the last batch (is Ollama down?); stopping")
+                break
+        return done
+
+    def create_index(self):
+        """Partial HNSW index for the target model so search can switch to it"""
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f"""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name(self.model)}
+                ON job_embeddings USING hnsw ((embedding::vector({int(self.dim)})) vector_cosine_ops)
+                WHERE model = '{self.model.replace("'", "''")}'
+            """))
+        print(f"OK {index_name(self.model)} ready")
+
+    def promote(self, batch_size=500):
+        """Copy the target model's vectors into jobs.embedding in batches"""
+        if int(self.dim) != 768:
+            print(f"Cannot promote: jobs.embedding is vector(768) but {self.model} is {self.dim}-d. "
+                  f"Keep serving it from job_embeddings via NEXT_EMBEDDING_MODEL.")
+            return 0
+        total = 0
+        while True:
+            with self.engine.begin() as conn:
+                result = conn.execute(text("""
+                    UPDATE jobs j SET
+                        embedding = je.embedding::vector(768),
+                        embedded_hash = je.content_hash,
+                        embedding_model = je.model
+                    FROM (
+                        SELECT je.job_id, je.embedding, je.content_hash, je.model
+                        FROM job_embeddings je
+                        JOIN jobs j2 ON j2.id = je.job_id
+                        WHERE je.model = :model
+                          AND j2.embedding_model IS DISTINCT FROM :model
+                        LIMIT :batch_size
+                    ) je
+                    WHERE j.id = je.job_id
+                """), {"model": self.model, "batch_size": batch_size})
+            if result.rowcount == 0:
+                break
+            total += result.rowcount
+            print(f"Promoted {total} jobs")
+        print(f"Done. Set EMBEDDING_MODEL={self.model} and unset NEXT_EMBEDDING_MODEL.")
+        return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Embedding model migration')
+    parser.add_argument('command', choices=['run', 'status', 'index', 'promote'])
+    parser.add_argument('--model', help='Target model (defaults to NEXT_EMBEDDING_MODEL)')
+    parser.add_argument('--dim', type=int, help='Target model dimensions (defaults to NEXT_EMBEDDING_DIM)')
+    parser.add_argument('--rate', type=float, help='Max jobs embedded per second')
+    parser.add_argument('--limit', type=int, help='Stop after this many jobs')
+    args = parser.parse_args()
+
+    migrator = EmbeddingMigrator(model=args.model, dim=args.dim)
+    if args.command == 'run':
+        migrator.run(rate=args.rate, limit=args.limit)
+        migrator.create_index()
+    elif args.command == 'index':
+        migrator.create_index()
+    elif args.command == 'promote':
+        migrator.promote()
+    coverage = model_coverage(migrator.engine, migrator.model)
+    print(f"{migrator.model}: {coverage:.1%} coverage "
+          f"(search switches at {config.MIGRATION_SWITCH_COVERAGE:.0%})")
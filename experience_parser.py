@@ -0,0 +1,96 @@
+import re
+
+NUMBER = r"(\d{1,2}(?:\.\d)?)"
+# Months are converted to fractional years; internships are usually listed in months
+UNIT = r"(years?|yrs?|y|months?|mos?|mon)\b"
+RANGE_PATTERN = re.compile(NUMBER + r"\s*(?:" + UNIT + r")?\s*(?:-|–|to)\s*" + NUMBER + r"\s*\+?\s*" + UNIT)
+PLUS_PATTERN = re.compile(NUMBER + r"\s*(?:\+\s*" + UNIT + r"|" + UNIT + r"\s*\+|" + UNIT + r"\s*(?:and\s+above|or\s+more))")
+MIN_PATTERN = re.compile(r"(?:min(?:imum)?|at\s+least)\.?\s*" + NUMBER + r"\s*" + UNIT)
+UPTO_PATTERN = re.compile(r"(?:up\s*to|upto|max(?:imum)?)\.?\s*" + NUMBER + r"\s*" + UNIT)
+SINGLE_PATTERN = re.compile(NUMBER + r"\s*" + UNIT)
+FRESHER_PATTERN = re.compile(r"\b(fresher|freshers|fresh\s+graduates?|entry[\s-]level|no\s+experience|\d{4}\s+batch|batch)\b")
+
+# The app's experience options as inclusive year ranges (None = open ended)
+EXPERIENCE_LEVELS = {
+    'fresher': (0, 1),
+    'junior': (1, 3),
+    'mid': (3, 5),
+    'senior': (5, None),
+}
+
+
+def _years(value, unit):
+    years = float(value)
+    if unit.startswith('m'):
+        years = round(years / 12, 2)
+    return years
+
+
+def parse_experience(text):
+    """Free-text experience -> (min_years, max_years, is_fresher); unknown bounds are None"""
+    if not text:
+        return None, None, False
+    text = text.lower()
+    is_fresher = bool(FRESHER_PATTERN.search(text))
+
+    match = RANGE_PATTERN.search(text)
+    if match:
+        low_value, low_unit, high_value, high_unit = match.groups()
+        # "0 to 6 months": the first number takes the second one's unit
+        low, high = sorted((_years(low_value, low_unit or high_unit), _years(high_value, high_unit)))
+        return low, high, is_fresher or low == 0
+
+    match = UPTO_PATTERN.search(text)
+    if match:
+        return 0.0, _years(*match.groups()), True
+
+    match = PLUS_PATTERN.search(text) or MIN_PATTERN.search(text)
+    if match:
+        value = match.group(1)
+        unit = next(group for group in match.groups()[1:] if group)
+        low = _years(value, unit)
+        return low, None, is_fresher or low == 0
+
+    match = SINGLE_PATTERN.search(text)
+    if match:
+        years = _years(*match.groups())
+        return years, years, is_fresher or years == 0
+
+    if is_fresher:
+        return 0.0, 1.0, True
+    return None, None, False
+
+
+def experience_range(level):
+    """Map a filter value like 'Junior (1-3y)' to a (min, max) year range, or None"""
+    level = (level or '').lower()
+    for name, bounds in EXPERIENCE_LEVELS.items():
+        if name in level:
+            return bounds
+    low, high, _ = parse_experience(level)
+    if low is None:
+        return None
+    return low, high
+
+
+if __name__ == "__main__":
+    # Sample strings from the scraped sites and the parse each must give
+    CASES = {
+        "0 to 6 Months": (0.0, 0.5, True),
+        "6 months - 1 year": (0.5, 1.0, False),
+        "3-6 months": (0.25, 0.5, False),
+        "6 Months": (0.5, 0.5, False),
+        "2-5 Yrs": (2.0, 5.0, False),
+        "0 - 1 years": (0.0, 1.0, True),
+        "5+ years": (5.0, None, False),
+        "Minimum 3 years": (3.0, None, False),
+        "Up to 2 years": (0.0, 2.0, True),
+        "Freshers": (0.0, 1.0, True),
+        "": (None, None, False),
+    }
+    failures = 0
+    for text, expected in CASES.items():
+        parsed = parse_experience(text)
+        failures += parsed != expected
+        print(f"{'OK  ' if parsed == expected else 'FAIL'} {text!r}: {parsed}")
+    raise SystemExit(1 if failures else 0)
@@ -8,6 +8,10 @@ from scrapers.jobsnet_scraper import scrape_jobsnet
 from scrapers.freshersnow_scraper import scrape_freshersnow
 from scrapers.freshersrecruitment_scraper import scrape_freshersrecruitment
 from job_processor import JobProcessor
+from embedding_migration import EmbeddingMigrator
+from vector_index import get_index
+from cache import IngestGeneration
+from db import get_engine
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import config
@@ -56,10 +60,42 @@ def process_embeddings_and_roles():
     print("=" * 60)
     try:
         processor = JobProcessor()
-        processor.process_jobs_parallel(max_workers=8)  # Process 8 jobs at once
+        processor.process_jobs_parallel(max_workers=8, limit=None)  # Drain the queue, 8 jobs at once
+        processor.refresh_skills()
+        processor.refresh_attributes()
         print("OK Embeddings and roles processed successfully")
     except Exception as e:
         print(f"ERROR processing embeddings and roles: {e}")
+
+def process_next_model_embeddings():
+    """Keep the migration target model's embeddings current for new and edited jobs"""
+    if not config.NEXT_EMBEDDING_MODEL:
+        return
+    print(f"\nEmbedding new jobs for migration target {config.NEXT_EMBEDDING_MODEL}")
+    try:
+        EmbeddingMigrator().run()
+    except Exception as e:
+        print(f"ERROR processing migration embeddings: {e}")
+
+def sync_vector_index():
+    """Publish newly embedded jobs to the in-process vector index, if one is configured"""
+    index = get_index()
+    if index is None:
+        return
+    print("\nSyncing vector index")
+    try:
+        index.sync(get_engine(statement_timeout=0))
+    except Exception as e:
+        print(f"ERROR syncing vector index: {e}")
+
+def bump_ingest_generation():
+    """Invalidate cached search results now that new jobs are searchable"""
+    try:
+        generation = IngestGeneration.bump(get_engine())
+        print(f"OK Ingest generation {generation}")
+    except Exception as e:
+        print(f"ERROR bumping ingest generation: {e}")
+
 def main():
     """Main pipeline execution"""
     # Step 1: Run all scrapers
@@ -67,6 +103,9 @@ def main():
     if total_jobs > 0:
         # Step 2: Process embeddings and roles
         process_embeddings_and_roles()
+        process_next_model_embeddings()
+        sync_vector_index()
+        bump_ingest_generation()
         print("\n" + "=" * 60)
         print("PIPELINE COMPLETE!")
         print("Data is ready for job search")
@@ -1,9 +1,23 @@
-import requests
-import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 import re
+import os
+import socket
+import time
 from concurrent.futures import ThreadPoolExecutor
 import config
+from db import get_engine
+from ollama_client import OllamaClient, OllamaUnavailable, get_client
+from skill_matcher import SKILL_VOCAB_VERSION, extract_skills
+from experience_parser import parse_experience
+from location_normalizer import canonical_locations
+
+# Rows the embedding workers still have to process: never embedded, or the
+# title/description changed since the stored embedding was computed
+PENDING_CONDITION = "(embedding IS NULL OR role IS NULL OR embedded_hash IS DISTINCT FROM content_hash)"
+
+# Bump when the parsing of structured attributes (experience range, ...) changes
+ATTRIBUTES_VERSION = 3
+
 ROLE_PATTERNS = [
     (re.compile(r"\b(ai|artificial\s+intelligence)[/\s]+(ml|machine\s+learning)\s+(engineer|scientist|specialist|developer)\b", re.I), "AI/ML Engineer"),
     (re.compile(r"\b(machine\s+learning|ml)\s+(engineer|scientist|specialist|developer)\b", re.I), "ML Engineer"),
@@ -48,25 +62,13 @@ ROLE_PATTERNS = [
 
 class JobProcessor:
     def __init__(self, db_url=None, ollama_url=None):
-        self.engine = create_engine(
-            db_url or config.DB_URL,
-            pool_size=10,
-            max_overflow=20,
-            pool_pre_ping=True
-        )
-        self.ollama_url = ollama_url or config.OLLAMA_URL
+        self.engine = get_engine(db_url)
+        self.ollama = OllamaClient([ollama_url]) if ollama_url else get_client()
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
 
     def get_embedding(self, text):
-        response = requests.post(
-            f"{self.ollama_url}/api/embeddings",
-            json={
-                "model": "nomic-embed-text:v1.5",
-                "prompt": text
-            },
-            timeout=60
-        )
-        response.raise_for_status()
-        return response.json()["embedding"]
+        return self.ollama.embed(text, config.EMBEDDING_MODEL, timeout=60)
+
     def extract_role(self, title, description):
         text = f"{title} {description or ''}"
 
@@ -82,6 +84,7 @@ class JobProcessor:
 
             embedding = self.get_embedding(combined_text)
             role = self.extract_role(job["title"], job["description"])
+            skills = sorted(extract_skills(job["description"]))
 
             with self.engine.begin() as conn:
                 conn.execute(
@@ -89,41 +92,201 @@ class JobProcessor:
                         UPDATE jobs
                         SET embedding = :embedding,
                             role = :role,
-                            updated_at = NOW()
-                        WHERE id = :job_id
+                            skills = :skills,
+                            skills_version = :skills_version,
+                            embedded_hash = :embedded_hash,
+                            embedding_model = :embedding_model,
+                            updated_at = NOW(),
+                            lease_owner = NULL,
+                            lease_expires_at = NULL,
+                            attempts = 0
+                        WHERE id = :job_id AND lease_owner = :worker_id
                     """),
                     {
                         "embedding": embedding,
                         "role": role,
-                        "job_id": job["id"]
+                        "skills": skills,
+                        "skills_version": SKILL_VOCAB_VERSION,
+                        "embedded_hash": job["content_hash"],
+                        "embedding_model": config.EMBEDDING_MODEL,
+                        "job_id": job["id"],
+                        "worker_id": self.worker_id
                     }
                 )
 
             print(f"OK {job['title'][:35]} -> {role}")
+            return True
 
+        except OllamaUnavailable as e:
+            if self.ollama.any_available():
+                print(f"ERROR ({job['title'][:30]}): {e}")
+                return False
+            # Outage, not a problem with this posting: hand the row back without using an attempt
+            self.release_job(job, refund_attempt=True)
+            return None
         except Exception as e:
             print(f"ERROR ({job['title'][:30]}): {e}")
+            if job["attempts"] >= config.WORKER_MAX_ATTEMPTS:
+                print(f"GIVING UP on job {job['id']} after {job['attempts']} attempts "
+                      f"(requeue with: python job_processor.py --requeue)")
+            return False
+
+    def release_job(self, job, refund_attempt=False):
+        with self.engine.begin() as conn:
+            conn.execute(
+                text("""
+                    UPDATE jobs
+                    SET lease_owner = NULL,
+                        lease_expires_at = NULL,
+                        attempts = GREATEST(attempts - :refund, 0)
+                    WHERE id = :job_id AND lease_owner = :worker_id
+                """),
+                {"refund": int(refund_attempt), "job_id": job["id"], "worker_id": self.worker_id}
+            )
+
+    def requeue_failed(self):
+        """Give rows that hit WORKER_MAX_ATTEMPTS another full set of attempts"""
+        with self.engine.begin() as conn:
+            count = conn.execute(
+                text(f"UPDATE jobs SET attempts = 0 WHERE attempts >= :max_attempts AND {PENDING_CONDITION}"),
+                {"max_attempts": config.WORKER_MAX_ATTEMPTS}
+            ).rowcount
+        print(f"Requeued {count} jobs")
+        return count
+
+    def claim_jobs(self, batch_size=None):
+        """Lease a batch of pending jobs; rows leased by other workers are skipped"""
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                text(f"""
+                    UPDATE jobs
+                    SET lease_owner = :worker_id,
+                        lease_expires_at = NOW() + make_interval(secs => :lease_seconds),
+                        attempts = CASE WHEN attempts_hash IS DISTINCT FROM content_hash THEN 1
+                                        ELSE attempts + 1 END,
+                        attempts_hash = content_hash
+                    WHERE id IN (
+                        SELECT id FROM jobs
+                        WHERE {PENDING_CONDITION}
+                          AND (lease_expires_at IS NULL OR lease_expires_at < NOW())
+                          AND (attempts < :max_attempts OR attempts_hash IS DISTINCT FROM content_hash)
+                        ORDER BY updated_at
+                        LIMIT :batch_size
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING id, title, description, content_hash, attempts
+                """),
+                {
+                    "worker_id": self.worker_id,
+                    "lease_seconds": config.WORKER_LEASE_SECONDS,
+                    "max_attempts": config.WORKER_MAX_ATTEMPTS,
+                    "batch_size": batch_size or config.WORKER_BATCH_SIZE
+                }
+            )
+            return [dict(row._mapping) for row in result]
 
     def process_jobs_parallel(self, max_workers=8, limit=200):
-        query = f"""
-            SELECT id, title, description
-            FROM jobs
-            WHERE embedding IS NULL OR role IS NULL
-            LIMIT {limit}
-        """
-
-        jobs = pd.read_sql(query, self.engine)
-        if jobs.empty:
+        """Claim and process pending jobs until the queue is drained or limit is reached"""
+        processed = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while limit is None or processed < limit:
+                batch_size = config.WORKER_BATCH_SIZE
+                if limit is not None:
+                    batch_size = min(batch_size, limit - processed)
+                jobs = self.claim_jobs(batch_size)
+                if not jobs:
+                    break
+
+                print(f"[{self.worker_id}] Processing {len(jobs)} jobs with {max_workers} workers")
+                results = list(executor.map(self.process_single_job, jobs))
+                processed += len(jobs)
+                if None in results:
+                    print(f"[{self.worker_id}] Ollama unavailable; unprocessed jobs returned to the queue")
+                    break
+
+        if not processed:
             print("No jobs to process")
-            return
+        return processed
 
-        print(f"Processing {len(jobs)} jobs with {max_workers} workers")
+    def _refresh_rows(self, version_column, version, select_columns, derive, batch_size=500):
+        """Recompute derived columns for rows whose version_column differs from version"""
+        total = 0
+        while True:
+            with self.engine.begin() as conn:
+                rows = conn.execute(
+                    text(f"""
+                        SELECT id, {select_columns} FROM jobs
+                        WHERE {version_column} IS DISTINCT FROM :version
+                        LIMIT :batch_size
+                        FOR UPDATE SKIP LOCKED
+                    """),
+                    {"version": version, "batch_size": batch_size}
+                ).fetchall()
+                if not rows:
+                    break
+                updates = [dict(derive(row), job_id=row.id, version=version) for row in rows]
+                set_str = ", ".join(f"{column} = :{column}" for column in updates[0] if column not in ("job_id", "version"))
+                conn.execute(
+                    text(f"""
+                        UPDATE jobs SET {set_str}, {version_column} = :version
+                        WHERE id = :job_id
+                    """),
+                    updates
+                )
+            total += len(rows)
+        return total
+
+    def refresh_skills(self, batch_size=500):
+        """Re-extract stored skills for rows extracted with an older vocabulary (no embedding needed)"""
+        total = self._refresh_rows(
+            "skills_version", SKILL_VOCAB_VERSION, "description",
+            lambda row: {"skills": sorted(extract_skills(row.description))},
+            batch_size
+        )
+        if total:
+            print(f"Refreshed skills for {total} jobs (vocabulary {SKILL_VOCAB_VERSION})")
+        return total
+
+    def parse_attributes(self, row):
+        exp_min, exp_max, is_fresher = parse_experience(row.experience)
+        return {
+            "exp_min_years": exp_min,
+            "exp_max_years": exp_max,
+            "is_fresher": is_fresher,
+            "locations": canonical_locations(row.location)
+        }
+
+    def refresh_attributes(self, batch_size=500):
+        """Parse free-text experience and location into indexed structured columns"""
+        total = self._refresh_rows(
+            "attributes_version", ATTRIBUTES_VERSION, "experience, location",
+            self.parse_attributes, batch_size
+        )
+        if total:
+            print(f"Parsed attributes for {total} jobs")
+        return total
+
+    def run_worker(self, max_workers=8):
+        """Keep draining the queue, polling when it is empty"""
+        print(f"[{self.worker_id}] Embedding worker started")
+        while True:
+            self.refresh_attributes()
+            processed = self.process_jobs_parallel(max_workers=max_workers, limit=None)
+            if not processed or not self.ollama.any_available():
+                time.sleep(config.WORKER_POLL_SECONDS)
 
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            executor.map(
-                self.process_single_job,
-                jobs.to_dict("records")
-            )
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Job embedding processor')
+    parser.add_argument('--worker', action='store_true', help='Run as a long-lived queue worker')
+    parser.add_argument('--max-workers', type=int, default=8)
+    parser.add_argument('--requeue', action='store_true', help='Reset attempts for jobs that hit WORKER_MAX_ATTEMPTS')
+    args = parser.parse_args()
+
     processor = JobProcessor()
-    processor.process_jobs_parallel(max_workers=8, limit=200)
\ No newline at end of file
+    if args.requeue:
+        processor.requeue_failed()
+    elif args.worker:
+        processor.run_worker(max_workers=args.max_workers)
+    else:
+        processor.process_jobs_parallel(max_workers=args.max_workers, limit=200)
\ No newline at end of file
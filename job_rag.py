@@ -1,73 +1,269 @@
-import requests
+import contextvars
+import hashlib
 import json
-from sqlalchemy import create_engine, text
-import pandas as pd
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from sqlalchemy import text
+import pandas as pd
+import numpy as np
+import time
 import config
+from db import get_engine
+import vector_storage
+import metrics
+from ollama_client import OllamaClient, get_client
+from embedding_migration import model_coverage
+from cache import TTLCache, IngestGeneration, LLMResponseCache
+from skill_matcher import SkillMatcher
+from experience_parser import experience_range
+from location_normalizer import location_filter_ids
+from vector_index import get_index
+
+LEXICAL_ALL = "websearch_to_tsquery('english', :lexical_query)"
+LEXICAL_ANY = "websearch_to_tsquery('english', :lexical_any)"
+# Words the app adds to every query ("<role> jobs in <location> using <skills>"); they
+# would match most rows. English stop words are already dropped by websearch_to_tsquery.
+TEMPLATE_WORDS = {"jobs", "job", "using", "looking", "or", "role", "roles", "openings", "vacancies"}
+
+# Phase one of retrieval selects only what ranking needs; description is kept just for
+# rows whose skills have not been extracted yet. Phase two fetches DETAIL_COLUMNS for the top-k.
+CANDIDATE_COLUMNS = """id, title, role, location, experience, skills,
+                       CASE WHEN skills IS NULL THEN description END AS description"""
+DETAIL_COLUMNS = "listing_url, apply_url, posted_date"
+
+# Ollama options for the job match analysis
+LLM_OPTIONS = {
+    "num_predict": 150,
+    "temperature": 0.3,
+    "num_threads": 6
+}
+
+class BudgetPool:
+    """Threads for Ollama calls made under a latency budget. Abandoned calls finish here and
+    still fill the caches; a call waits for a free thread only as long as its budget allows."""
+
+    def __init__(self, max_workers, name):
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self.slots = threading.BoundedSemaphore(max_workers)
+
+    def run(self, fn, budget_ms, *args, **kwargs):
+        """fn(*args, **kwargs), raising FutureTimeout if waiting for a free thread plus the call
+        take longer than budget_ms (0 = no limit)"""
+        if not budget_ms:
+            return fn(*args, **kwargs)
+        deadline = time.perf_counter() + budget_ms / 1000
+        if not self.slots.acquire(timeout=budget_ms / 1000):
+            raise FutureTimeout(f"skipped, all {self.max_workers} workers busy for {budget_ms} ms")
+        future = self.executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        future.add_done_callback(lambda _: self.slots.release())
+        return future.result(timeout=max(deadline - time.perf_counter(), 0))
+
+
+# Separate pools so slow abandoned generations cannot starve query embeddings
+_embedding_pool = BudgetPool(config.EMBEDDING_BUDGET_WORKERS, 'embedding-budget')
+_llm_pool = BudgetPool(config.LLM_BUDGET_WORKERS, 'llm-budget')
+
+
+# Per-search filters of search_jobs_batch, read from the VALUES row `q` (NULL = not applied)
+BATCH_FILTERS = """
+    (q.location_ids IS NULL OR locations && q.location_ids)
+    AND (q.location_pattern IS NULL OR LOWER(location) LIKE q.location_pattern)
+    AND (q.exp_min IS NULL
+         OR (q.exp_min = 0 AND is_fresher)
+         OR (COALESCE(exp_max_years, 99) >= q.exp_min
+             AND CASE WHEN q.exp_max IS NULL THEN exp_min_years IS NOT NULL
+                      ELSE exp_min_years <= q.exp_max END))
+    AND (q.experience_pattern IS NULL OR LOWER(experience) LIKE q.experience_pattern)
+    AND (q.user_skills IS NULL OR skills && q.user_skills)
+"""
+
+# Shared by every JobRAG in the process (the app creates one per session)
+_query_embedding_cache = TTLCache(maxsize=config.QUERY_CACHE_SIZE, ttl=config.QUERY_CACHE_TTL)
+_search_result_cache = TTLCache(maxsize=config.RESULT_CACHE_SIZE, ttl=config.RESULT_CACHE_TTL)
+_ingest_generation = IngestGeneration(check_interval=config.INGEST_GENERATION_CHECK_SECONDS)
 
 class JobRAG:
     def __init__(self, db_url=None, ollama_url=None):
-        self.engine = create_engine(db_url or config.DB_URL)
-        self.ollama_url = ollama_url or config.OLLAMA_URL
-        self.skill_patterns = {
-            "spark": r"\b(py)?spark\b",
-            "power bi": r"\bpower\s*bi\b",
-            "machine learning": r"\b(machine\s*learning|ml)\b",
-            "deep learning": r"\b(deep\s*learning|dl)\b",
-            "javascript": r"\b(java\s*script|javascript|js)\b",
-            "typescript": r"\b(type\s*script|typescript|ts)\b",
-            "postgresql": r"\b(postgres|postgresql)\b",
-            "mysql": r"\b(my\s*sql|mysql)\b",
-            "c++": r"\b(c\+\+)\b",
-            "c#": r"\b(c#|c sharp)\b",
-        }
-        self.tech_skills = {
-            'python', 'java', 'javascript', 'typescript', 'c++', 'c#', 'go', 'rust', 'php', 'ruby', 'scala', 'kotlin', 'swift', 'dart', 'r', 'julia',
-            'react', 'angular', 'vue', 'svelte', 'next.js', 'nuxt.js', 'node', 'express', 'nestjs', 'django', 'flask', 'fastapi', 'spring', 'asp.net', 'laravel', 'rails',
-            'sql', 'mysql', 'postgresql', 'mongodb', 'redis', 'elasticsearch', 'cassandra', 'dynamodb', 'mariadb', 'sqlite', 'neo4j', 'couchbase',
-            'aws', 'azure', 'gcp', 'digitalocean', 'firebase', 'devops', 'docker', 'kubernetes', 'jenkins', 'terraform', 'ansible', 'helm', 'istio', 'github actions', 'circleci',
-            'machine learning', 'deep learning', 'nlp', 'computer vision', 'pytorch', 'tensorflow', 'keras', 'scikit-learn', 'pandas', 'numpy', 'matplotlib', 'seaborn', 'opencv', 'huggingface', 'llm', 'langchain', 'vector database',
-            'git', 'github', 'gitlab', 'bitbucket', 'jira', 'confluence', 'agile', 'scrum', 'kanban',
-            'html', 'css', 'sass', 'less', 'bootstrap', 'tailwind', 'material-ui', 'figma', 'adobe xd',
-            'linux', 'unix', 'bash', 'shell', 'powershell',
-            'data analysis', 'data engineering', 'data visualization', 'tableau', 'power bi', 'looker', 'metabase',
-            'big data', 'hadoop', 'hive', 'hbase', 'pig', 'spark', 'pyspark', 'airflow', 'sqoop', 'kafka', 'flink', 'snowflake', 'databricks', 'presto', 'trino', 'redshift', 'bigquery', 'dbt', 'clickhouse', 'druid', 'iceberg', 'delta lake',
-            'selenium', 'cypress', 'playwright', 'jest', 'mocha', 'junit', 'pytest',
-            'rest api', 'graphql', 'grpc', 'microservices', 'serverless', 'web3', 'solidity', 'ethereum', 'smart contracts',
-            'cybersecurity', 'penetration testing', 'iam', 'oauth', 'jwt', 'flutter', 'react native', 'ionic'
-        }
-
-    def get_embedding(self, text):
+        self.engine = get_engine(db_url)
+        self.ollama = OllamaClient([ollama_url]) if ollama_url else get_client()
+        self.embedding_storage = config.EMBEDDING_STORAGE
+        self.rerank_multiplier = config.RERANK_MULTIPLIER
+        self.embedding_model = config.EMBEDDING_MODEL
+        self.next_model = config.NEXT_EMBEDDING_MODEL
+        self._next_model_ready = False
+        self._coverage_checked_at = 0.0
+        self.query_cache = _query_embedding_cache
+        self.result_cache = _search_result_cache
+        self.ingest_generation = _ingest_generation
+        self.llm_cache = LLMResponseCache(self.engine, config.LLM_CACHE_SIZE, config.LLM_CACHE_TTL) if config.LLM_CACHE else None
+        self.vector_index = get_index()
+        self.skill_matcher = SkillMatcher()
+
+    def get_embedding(self, text, model=None):
         try:
-            response = requests.post(f"{self.ollama_url}/api/embeddings", 
-                                   json={"model": "nomic-embed-text:v1.5", "prompt": text},
-                                   timeout=30)
-            response.raise_for_status()
-            return response.json()["embedding"]
+            return self.ollama.embed(text, model or self.embedding_model, timeout=30)
         except Exception as e:
             print(f"Embedding error: {e}")
             return None
 
+    @staticmethod
+    def normalize_query(query):
+        return " ".join((query or "").lower().split())
+
+    def lexical_terms(self, query, filters=None):
+        """Query words worth a full-text match: no template words, and no location words
+        when a location filter already applies"""
+        skip = TEMPLATE_WORDS | set(re.findall(r"\w+", ((filters or {}).get('location') or '').lower()))
+        terms = []
+        for term in re.findall(r"\w+", self.normalize_query(query)):
+            if term not in skip and term not in terms:
+                terms.append(term)
+        return terms
+
+    def _lexical_hits_sql(self, where_str, fallback=True):
+        """(id, lex_score) of the best full-text matches: jobs with every query term, or,
+        only when there are none, jobs with any of them"""
+        all_terms = f"""
+            SELECT id, ts_rank_cd(search_tsv, {LEXICAL_ALL}, 32) AS lex_score
+            FROM jobs
+            WHERE search_tsv @@ {LEXICAL_ALL} AND {where_str}
+            ORDER BY lex_score DESC
+            LIMIT :limit
+        """
+        if not fallback:
+            return all_terms
+        # NOT EXISTS is evaluated once, so the broad OR scan only runs when the AND match is empty
+        return f"""
+            WITH lex_all AS ({all_terms})
+            SELECT id, lex_score FROM lex_all
+            UNION ALL
+            (SELECT id, ts_rank_cd(search_tsv, {LEXICAL_ANY}, 32) AS lex_score
+             FROM jobs
+             WHERE NOT EXISTS (SELECT 1 FROM lex_all)
+               AND search_tsv @@ {LEXICAL_ANY} AND {where_str}
+             ORDER BY lex_score DESC
+             LIMIT :limit)
+        """
+
+    def embed_query(self, query, model=None):
+        """Query embedding via the in-process LRU, then the shared table, then Ollama"""
+        model = model or self.embedding_model
+        embedding = self.cached_query_embedding(query, model)
+        if embedding is not None:
+            return embedding
+        return self._embed_uncached_query(query, model)
+
+    def cached_query_embedding(self, query, model=None):
+        """Query embedding from the in-process LRU or the shared table, else None"""
+        model = model or self.embedding_model
+        key = (model, self.normalize_query(query))
+        embedding = self.query_cache.get(key)
+        if embedding is None and config.QUERY_CACHE_PERSIST:
+            embedding = self._load_query_embedding(*key)
+            if embedding is not None:
+                self.query_cache.set(key, embedding)
+        return embedding
+
+    def _embed_uncached_query(self, query, model):
+        """Ollama round trip for a query missing from the caches; fills both"""
+        key = (model, self.normalize_query(query))
+        with metrics.span("embedding"):
+            embedding = self.get_embedding(query, model)
+        if embedding is not None:
+            self.query_cache.set(key, embedding)
+            if config.QUERY_CACHE_PERSIST:
+                self._store_query_embedding(*key, embedding)
+        return embedding
+
+    def embed_query_within(self, query, model=None, budget_ms=None):
+        """embed_query, or None if it misses the budget (the embedding is still cached when it arrives)"""
+        model = model or self.embedding_model
+        embedding = self.cached_query_embedding(query, model)
+        if embedding is not None:
+            return embedding
+        # Only the Ollama round trip is budgeted; cache hits never wait for a pool thread
+        budget_ms = config.EMBEDDING_BUDGET_MS if budget_ms is None else budget_ms
+        try:
+            return _embedding_pool.run(self._embed_uncached_query, budget_ms, query, model)
+        except FutureTimeout as e:
+            print(f"Embedding {str(e) or f'missed its {budget_ms} ms budget'}; using full-text results")
+            metrics.record("embedding_budget_miss", budget_ms)
+            return None
+
+    def embed_queries(self, queries, model=None):
+        """Embeddings for many queries: cached ones from the LRU, the rest in batched calls of
+        EMBED_BATCH_SIZE; queries left unembedded (Ollama failing) are None"""
+        model = model or self.embedding_model
+        keys = [(model, self.normalize_query(query)) for query in queries]
+        embeddings = [self.query_cache.get(key) for key in keys]
+        missing = list({key: query for key, query, embedding in zip(keys, queries, embeddings) if embedding is None}.items())
+        embedded = {}
+        for start in range(0, len(missing), config.EMBED_BATCH_SIZE):
+            chunk = missing[start:start + config.EMBED_BATCH_SIZE]
+            try:
+                with metrics.span("embedding"):
+                    vectors = self.ollama.embed_batch([query for _, query in chunk], model)
+            except Exception as e:
+                # Later chunks would fail the same way and trip every endpoint's breaker
+                print(f"Batch embedding error: {e}")
+                break
+            for (key, _), vector in zip(chunk, vectors):
+                self.query_cache.set(key, vector)
+                embedded[key] = vector
+        if embedded:
+            embeddings = [embedded.get(key) if embedding is None else embedding
+                          for key, embedding in zip(keys, embeddings)]
+        return embeddings
+
+    def _load_query_embedding(self, model, query_key):
+        try:
+            with self.engine.connect() as conn:
+                row = conn.execute(text("""
+                    SELECT embedding::text FROM query_embedding_cache
+                    WHERE model = :model AND query_key = :query_key
+                      AND created_at > NOW() - make_interval(secs => :ttl)
+                """), {"model": model, "query_key": query_key, "ttl": config.QUERY_CACHE_TTL}).fetchone()
+            return json.loads(row[0]) if row else None
+        except Exception as e:
+            print(f"Query cache read error: {e}")
+            return None
+
+    def _store_query_embedding(self, model, query_key, embedding):
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(text("""
+                    INSERT INTO query_embedding_cache (model, query_key, embedding, created_at)
+                    VALUES (:model, :query_key, :embedding, NOW())
+                    ON CONFLICT (model, query_key) DO UPDATE SET
+                        embedding = EXCLUDED.embedding,
+                        created_at = NOW()
+                """), {"model": model, "query_key": query_key, "embedding": str(embedding)})
+        except Exception as e:
+            print(f"Query cache write error: {e}")
+
+    def search_model(self):
+        """Model to search with: the migration target once its coverage is high enough"""
+        if not self.next_model:
+            return self.embedding_model
+        if not self._next_model_ready and time.monotonic() - self._coverage_checked_at > 300:
+            self._coverage_checked_at = time.monotonic()
+            try:
+                coverage = model_coverage(self.engine, self.next_model)
+                self._next_model_ready = coverage >= config.MIGRATION_SWITCH_COVERAGE
+            except Exception as e:
+                print(f"Coverage check error: {e}")
+        return self.next_model if self._next_model_ready else self.embedding_model
+
     def extract_skills(self, text):
-        if not text:
-            return set()
-        text_lower = text.lower()
-        found_skills = set()
-        for skill, pattern in self.skill_patterns.items():
-            if re.search(pattern, text_lower):
-                found_skills.add(skill)
-        for skill in self.tech_skills:
-            if skill in self.skill_patterns:
-                continue
-            pattern = r'\b' + re.escape(skill) + r'\b'
-            if re.search(pattern, text_lower):
-                found_skills.add(skill)
-        return found_skills
+        return self.skill_matcher.extract(text)
 
-    def calculate_skill_match(self, job_desc, user_skills):
+    def calculate_skill_match(self, job_desc, user_skills, job_skills=None):
         if not user_skills:
             return 0.0, set()
-        job_skills = self.extract_skills(job_desc)
+        if job_skills is None:
+            job_skills = self.extract_skills(job_desc)
         if not job_skills:
             return 0.0, set()
         common_skills = user_skills.intersection(job_skills)
@@ -80,58 +276,275 @@ class JobRAG:
         score = (match_ratio * 0.8) + (coverage_ratio * 0.2)
         return min(score, 1.0), common_skills
 
-    def search_jobs(self, query, filters=None, limit=20):
-        filters = filters or {}
-        query_embedding = self.get_embedding(query)
-        
+    def _filter_values(self, filters):
+        """Bind values for the search filters; None means the filter is not applied"""
+        values = dict.fromkeys(['location_ids', 'location', 'exp_min', 'exp_max', 'experience', 'user_skills'])
+        if filters.get('location'):
+            location_ids = location_filter_ids(filters['location'])
+            if location_ids:
+                values['location_ids'] = location_ids
+            else:
+                values['location'] = f"%{filters['location'].lower()}%"
+
+        if filters.get('experience') and filters['experience'] != 'Any':
+            bounds = experience_range(filters['experience'])
+            if bounds:
+                values['exp_min'], values['exp_max'] = bounds
+            else:
+                values['experience'] = f"%{filters['experience'].lower()}%"
+
+        if filters.get('require_skill_match') and filters.get('resume_skills'):
+            values['user_skills'] = sorted(s.lower().strip() for s in filters['resume_skills'])
+        return values
+
+    def _candidate_sql(self, query, query_embedding, model, filters, params):
+        """Vector, full-text or fused candidate query honoring the filters; fills in params"""
         where_clauses = []
-        params = {"limit": limit * 3}  # Get more to ensure we have enough after scoring
-        
-        # Always try to get all jobs first, then score them
+        vector_clauses = []
+        from_str = "jobs"
         if query_embedding:
-            where_clauses.append("embedding IS NOT NULL")
             params["query_embedding"] = str(query_embedding)
-            vector_select = "1 - (embedding <=> :query_embedding) as vector_score"
+        # Cosine score for full-text hits the vector scan did not return
+        lexical_vector_score = f"COALESCE({vector_storage.EXACT_SCORE}, 0)"
+        
+        # Always try to get all jobs first, then score them
+        index_hits = None
+        values = self._filter_values(filters)
+        # The index returns the global top hits and Postgres filters only those, so a selective
+        # filter could leave too few rows; filtered searches use the SQL ANN scan instead
+        filtered = any(value is not None for value in values.values())
+        if query_embedding and model == self.embedding_model and self.vector_index and not filtered:
+            try:
+                index_hits = self.vector_index.search([query_embedding], params["limit"] * config.VECTOR_INDEX_OVERSAMPLE)[0]
+            except Exception as e:
+                print(f"Vector index error: {e}")
+
+        if index_hits is not None and len(index_hits[0]):
+            # In-process index already ranked the jobs; Postgres only applies filters
+            from_str = """jobs JOIN unnest(CAST(:candidate_ids AS uuid[]), CAST(:candidate_scores AS float8[]))
+                          AS hits(hit_id, hit_score) ON jobs.id = hits.hit_id"""
+            params["candidate_ids"] = list(index_hits[0])
+            params["candidate_scores"] = [float(score) for score in index_hits[1]]
+            distance = "1 - hit_score"
+        elif query_embedding and model != self.embedding_model:
+            # Mid-migration: vectors for the new model live in job_embeddings
+            from_str = "jobs JOIN job_embeddings je ON je.job_id = jobs.id AND je.model = :search_model"
+            params["search_model"] = model
+            distance = f"(je.embedding::vector({config.NEXT_EMBEDDING_DIM})) <=> :query_embedding"
+            lexical_vector_score = f"""COALESCE((SELECT 1 - ((je.embedding::vector({config.NEXT_EMBEDDING_DIM})) <=> :query_embedding)
+                                                FROM job_embeddings je
+                                                WHERE je.job_id = jobs.id AND je.model = :search_model), 0)"""
+        elif query_embedding:
+            vector_clauses.append("embedding IS NOT NULL")
+            distance = vector_storage.ann_order('vector')
         else:
-            vector_select = "0.1 as vector_score"
+            distance = None
+        # Order by the raw distance so the ANN index can serve the scan
+        vector_select = f"1 - ({distance}) as vector_score" if distance else "0.1 as vector_score"
+        order_str = distance or "vector_score DESC"
         
-        if filters.get('location'):
-            loc = filters['location'].lower()
+        params.update((name, value) for name, value in values.items() if value is not None)
+        if values['location_ids']:
+            # Served by the GIN index on jobs.locations
+            where_clauses.append("locations && CAST(:location_ids AS TEXT[])")
+        elif values['location']:
             where_clauses.append("LOWER(location) LIKE :location")
-            params['location'] = f"%{loc}%"
 
-        if filters.get('experience') and filters['experience'] != 'Any':
-            exp = filters['experience'].lower()
-            if 'fresher' in exp:
-                where_clauses.append("(LOWER(experience) LIKE '%fresher%' OR LOWER(experience) LIKE '%0%')")
+        if values['exp_min'] is not None:
+            # Range overlap on the parsed columns; open-ended job ranges count as 99 years
+            overlap = "COALESCE(exp_max_years, 99) >= :exp_min"
+            if values['exp_max'] is not None:
+                overlap += " AND exp_min_years <= :exp_max"
             else:
-                where_clauses.append("LOWER(experience) LIKE :experience")
-                params['experience'] = f"%{exp}%"
+                overlap += " AND exp_min_years IS NOT NULL"
+            if values['exp_min'] == 0:
+                overlap = f"is_fresher OR ({overlap})"
+            where_clauses.append(f"({overlap})")
+        elif values['experience']:
+            where_clauses.append("LOWER(experience) LIKE :experience")
             
+        if values['user_skills']:
+            # Served by the GIN index on jobs.skills
+            where_clauses.append("skills && CAST(:user_skills AS TEXT[])")
+
         where_str = " AND ".join(where_clauses) if where_clauses else "1=1"
+        vector_where_str = " AND ".join(vector_clauses + where_clauses) or "1=1"
         
-        with self.engine.connect() as conn:
-            stmt = text(f"""
-                SELECT id, title, role, location, experience, description, 
-                       listing_url, apply_url, posted_date,
+        columns = CANDIDATE_COLUMNS
+
+        if query_embedding and from_str == "jobs" and self.embedding_storage != 'vector':
+            # Quantized ANN scan, then exact float32 re-rank of the candidates
+            params["candidates"] = params["limit"] * self.rerank_multiplier
+            vector_sql = vector_storage.rerank_sql(self.embedding_storage, columns, vector_where_str)
+        else:
+            vector_sql = f"""
+                SELECT {columns},
                        {vector_select}
-                FROM jobs 
-                WHERE {where_str}
-                ORDER BY vector_score DESC
+                FROM {from_str}
+                WHERE {vector_where_str}
+                ORDER BY {order_str}
                 LIMIT :limit
-            """)
-            
-            result = conn.execute(stmt, params)
-            jobs_df = pd.DataFrame(result.fetchall(), columns=result.keys())
+            """
+
+        terms = self.lexical_terms(query, filters) if config.HYBRID_SEARCH else []
+        if not terms:
+            return vector_sql
+        params["lexical_query"] = " ".join(terms)
+        params["lexical_any"] = " or ".join(terms)
+        lexical_hits = self._lexical_hits_sql(where_str, fallback=len(terms) > 1)
+        if query_embedding:
+            params["rrf_k"] = config.RRF_K
+            return self._fused_sql(vector_sql, columns, lexical_hits, lexical_vector_score)
+        # No query embedding (Ollama down): full-text ranking instead of arbitrary rows
+        return f"""
+            SELECT {columns},
+                   hits.lex_score as vector_score
+            FROM ({lexical_hits}) hits JOIN jobs USING (id)
+            ORDER BY vector_score DESC
+            LIMIT :limit
+        """
+
+    def _fused_sql(self, vector_sql, columns, lexical_hits, lexical_vector_score):
+        """Reciprocal-rank fusion of the vector candidates with full-text candidates"""
+        # vector_score stays the cosine similarity the scorers expect; rrf_score picks the candidates
+        return f"""
+            WITH vec AS (
+                SELECT id, vector_score,
+                       ROW_NUMBER() OVER (ORDER BY vector_score DESC) AS vec_rank
+                FROM ({vector_sql}) v
+            ),
+            lex AS (
+                SELECT id, {lexical_vector_score} AS vector_score,
+                       ROW_NUMBER() OVER (ORDER BY hits.lex_score DESC) AS lex_rank
+                FROM ({lexical_hits}) hits JOIN jobs USING (id)
+            ),
+            fused AS (
+                SELECT COALESCE(vec.id, lex.id) AS id,
+                       COALESCE(vec.vector_score, lex.vector_score) AS vector_score,
+                       COALESCE(1.0 / (:rrf_k + vec.vec_rank), 0)
+                           + COALESCE(1.0 / (:rrf_k + lex.lex_rank), 0) AS rrf_score
+                FROM vec FULL OUTER JOIN lex ON vec.id = lex.id
+            )
+            SELECT {columns}, fused.vector_score, fused.rrf_score
+            FROM fused JOIN jobs USING (id)
+            ORDER BY rrf_score DESC
+            LIMIT :limit
+        """
+
+    def result_key(self, query, filters, limit, scoring, model, include_description=True, query_embedding=None):
+        """Cache key for a ranked result; includes the ingest generation so new data misses"""
+        filters_key = json.dumps(filters, sort_keys=True, default=sorted)
+        # A caller-supplied vector (user profile) ranks differently from the query text's own
+        vector_key = None
+        if query_embedding is not None:
+            vector_key = hashlib.md5(np.asarray(query_embedding, dtype=np.float32).tobytes()).hexdigest()
+        return (self.ingest_generation.current(self.engine), model, self.normalize_query(query),
+                filters_key, limit, scoring, include_description, vector_key)
+
+    def search_jobs(self, query, filters=None, limit=20, scoring=None, include_description=True,
+                    with_timings=False, query_embedding=None, budget_ms=None):
+        """Top jobs for a query; include_description=False leaves descriptions to job_description().
+        query_embedding (e.g. a user profile vector from EMBEDDING_MODEL) replaces embedding the
+        query text, which is still used for full-text retrieval and skills.
+        An embedding slower than budget_ms (default EMBEDDING_BUDGET_MS) gives full-text results.
+        with_timings=True returns (jobs_df, {stage: ms}) for this request."""
+        if with_timings:
+            with metrics.collect() as timings:
+                jobs_df = self.search_jobs(query, filters, limit, scoring, include_description,
+                                           query_embedding=query_embedding, budget_ms=budget_ms)
+            return jobs_df, timings
+
+        with metrics.span("search"):
+            filters = filters or {}
+            scoring = scoring or config.SEARCH_SCORING
+            model = self.search_model()
+            if model != self.embedding_model:
+                query_embedding = None  # profile vectors are from EMBEDDING_MODEL
+            cache_key = self.result_key(query, filters, limit, scoring, model, include_description, query_embedding)
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                return cached.copy()
+
+            if query_embedding is None:
+                query_embedding = self.embed_query_within(query, model, budget_ms)
+            jobs_df = self._search_jobs(query, query_embedding, model, filters, limit, scoring)
+            jobs_df = self.attach_details(jobs_df, include_description)
+            # Degraded (full-text only) results are not cached so they are replaced once Ollama is back
+            if query_embedding is not None:
+                self.result_cache.set(cache_key, jobs_df.copy())
+            return jobs_df
+
+    def search_jobs_lexical(self, query, filters=None, limit=20, scoring=None, include_description=True):
+        """Full-text ranked search that needs no query embedding; safe to run while one is computed"""
+        jobs_df = self._search_jobs(query, None, self.search_model(), filters or {}, limit,
+                                    scoring or config.SEARCH_SCORING)
+        return self.attach_details(jobs_df, include_description)
+
+    def job_details(self, ids, include_description=True):
+        """Phase two of retrieval: display columns for the final jobs only"""
+        columns = DETAIL_COLUMNS + (", description" if include_description else "")
+        with metrics.span("details"), self.engine.connect() as conn:
+            result = conn.execute(
+                text(f"SELECT id, {columns} FROM jobs WHERE id = ANY(CAST(:ids AS uuid[]))"),
+                {"ids": [str(job_id) for job_id in ids]}
+            )
+            return pd.DataFrame(result.fetchall(), columns=result.keys())
+
+    def attach_details(self, jobs_df, include_description=True):
+        """Merge job_details() into ranked results, keeping their order"""
+        if jobs_df.empty:
+            return jobs_df
+        details = self.job_details(jobs_df['id'], include_description)
+        overlap = [column for column in details.columns if column != 'id' and column in jobs_df.columns]
+        return jobs_df.drop(columns=overlap).merge(details, on='id', how='left')
+
+    def job_description(self, job_id):
+        """Full description of one job, for views that show it on demand"""
+        with self.engine.connect() as conn:
+            return conn.execute(
+                text("SELECT description FROM jobs WHERE id = CAST(:id AS uuid)"),
+                {"id": str(job_id)}
+            ).scalar()
+
+    def _search_jobs(self, query, query_embedding, model, filters, limit, scoring):
+        """Uncached search: candidate retrieval, then pandas or SQL scoring"""
+        user_skills = filters.get('resume_skills', set())
+        if not user_skills:
+            user_skills = self.extract_skills(query)
+
+        # Get more candidates than needed to ensure we have enough after scoring
+        multiplier = config.SQL_CANDIDATE_MULTIPLIER if scoring == 'sql' else config.CANDIDATE_MULTIPLIER
+        params = {"limit": limit * multiplier}
+        candidate_sql = self._candidate_sql(query, query_embedding, model, filters, params)
+
+        if scoring == 'sql':
+            stmt, params = self._sql_scoring(candidate_sql, params, filters, user_skills, limit)
+        else:
+            stmt = candidate_sql
+
+        with self.engine.connect() as conn:
+            with metrics.span("sql"):
+                if query_embedding:
+                    vector_storage.apply_search_params(conn)
+                result = conn.execute(text(stmt), params)
+                rows = result.fetchall()
+            with metrics.span("dataframe"):
+                jobs_df = pd.DataFrame(rows, columns=result.keys())
             
         if jobs_df.empty:
             return pd.DataFrame()
+        if scoring == 'sql':
+            return jobs_df
+        with metrics.span("scoring"):
+            return self.score_jobs(jobs_df, filters, user_skills, limit)
 
+    def score_jobs(self, jobs_df, filters, user_skills, limit):
+        """Hybrid scoring in pandas; reference implementation for the SQL scoring mode"""
         # Priority scoring: Role > Title > Vector similarity (original logic)
         if filters.get('role_type'):
             role_term = filters['role_type'].lower()
-            jobs_df['title_match'] = jobs_df['title'].fillna('').str.lower().str.contains(role_term, na=False).astype(float) * 0.6
-            jobs_df['role_match'] = jobs_df['role'].fillna('').str.lower().str.contains(role_term, na=False).astype(float) * 0.5
+            jobs_df['title_match'] = jobs_df['title'].fillna('').str.lower().str.contains(role_term, na=False, regex=False).astype(float) * 0.6
+            jobs_df['role_match'] = jobs_df['role'].fillna('').str.lower().str.contains(role_term, na=False, regex=False).astype(float) * 0.5
             jobs_df['final_score'] = jobs_df['title_match'] + jobs_df['role_match'] + (jobs_df['vector_score'] * 0.3)
         else:
             jobs_df['final_score'] = jobs_df['vector_score']
@@ -139,16 +552,14 @@ class JobRAG:
             jobs_df['title_match'] = 0.0
 
         # Add skill matching
-        user_skills = filters.get('resume_skills', set())
-        if not user_skills:
-            user_skills = self.extract_skills(query)
-
         if user_skills:
             skill_scores = []
             matched_skills_list = []
             
-            for desc in jobs_df['description']:
-                score, matched = self.calculate_skill_match(desc, user_skills)
+            for desc, stored in zip(jobs_df['description'], jobs_df['skills']):
+                # Skills are extracted at ingest; only rows not yet processed need the text
+                job_skills = set(stored) if isinstance(stored, list) else None
+                score, matched = self.calculate_skill_match(desc, user_skills, job_skills)
                 skill_scores.append(score)
                 matched_skills_list.append(list(matched))
             
@@ -169,20 +580,254 @@ class JobRAG:
         
         return jobs_df
 
-    def generate_response(self, query, jobs_df, user_skills=None):
-        if not user_skills:
-            user_skills = set()
-            
+    def _sql_scoring(self, candidate_sql, params, filters, user_skills, limit):
+        """Wrap the candidate query so the same hybrid scoring as score_jobs runs in Postgres.
+        One difference: rows whose skills are not extracted yet (skills IS NULL) score as having
+        no skills here, while score_jobs extracts them from the description. The embedding
+        workers fill in skills at ingest, so this only affects rows still in the queue."""
+        params = dict(params, final_limit=limit)
+
+        if filters.get('role_type'):
+            params['role_term'] = filters['role_type'].lower()
+            title_expr = "CASE WHEN strpos(LOWER(COALESCE(title, '')), :role_term) > 0 THEN 0.6 ELSE 0.0 END"
+            role_expr = "CASE WHEN strpos(LOWER(COALESCE(role, '')), :role_term) > 0 THEN 0.5 ELSE 0.0 END"
+            base_expr = "title_match + role_match + vector_score * 0.3"
+        else:
+            title_expr = role_expr = "0.0"
+            base_expr = "vector_score"
+
+        if user_skills:
+            params['scoring_skills'] = sorted(user_skills)
+            params['scoring_skill_count'] = len(user_skills)
+            skill_expr = """CASE WHEN cardinality(matched_skills) = 0 THEN 0.0
+                    ELSE LEAST(0.8 * cardinality(matched_skills) / cardinality(skills)
+                               + 0.2 * cardinality(matched_skills) / :scoring_skill_count, 1.0) END"""
+            final_expr = f"{base_expr} + skill_score * 0.4 - CASE WHEN skill_score = 0 THEN 0.3 ELSE 0.0 END"
+        else:
+            params['scoring_skills'] = []
+            skill_expr = "0.0"
+            final_expr = base_expr
+
+        stmt = f"""
+            WITH candidates AS ({candidate_sql}),
+            matched AS (
+                SELECT c.*,
+                       ARRAY(SELECT unnest(COALESCE(c.skills, '{{}}'::text[]))
+                             INTERSECT
+                             SELECT unnest(CAST(:scoring_skills AS TEXT[]))) AS matched_skills
+                FROM candidates c
+            ),
+            scored AS (
+                SELECT m.*,
+                       ({title_expr})::float AS title_match,
+                       ({role_expr})::float AS role_match,
+                       ({skill_expr})::float AS skill_score
+                FROM matched m
+            )
+            SELECT s.*, LEAST({final_expr}, 0.90)::float AS final_score
+            FROM scored s
+            ORDER BY final_score DESC
+            LIMIT :final_limit
+        """
+        return stmt, params
+
+    def compare_scoring(self, query, filters=None):
+        """Score one candidate set with score_jobs and with SQL scoring and compare them.
+        Returns (max score difference, same ranking, number of rows with NULL skills);
+        those rows are left out of the comparison (see _sql_scoring)"""
+        filters = filters or {}
+        model = self.search_model()
+        query_embedding = self.embed_query(query, model)
+        user_skills = filters.get('resume_skills', set()) or self.extract_skills(query)
+        params = {"limit": 20 * config.SQL_CANDIDATE_MULTIPLIER}
+        candidate_sql = self._candidate_sql(query, query_embedding, model, filters, params)
+        sql_stmt, sql_params = self._sql_scoring(candidate_sql, params, filters, user_skills, params["limit"])
+
+        with self.engine.connect() as conn:
+            if query_embedding:
+                vector_storage.apply_search_params(conn)
+            result = conn.execute(text(candidate_sql), params)
+            candidates = pd.DataFrame(result.fetchall(), columns=result.keys())
+            result = conn.execute(text(sql_stmt), sql_params)
+            sql_scored = pd.DataFrame(result.fetchall(), columns=result.keys())
+        if candidates.empty:
+            return 0.0, True, 0
+
+        null_ids = set(candidates.loc[candidates['skills'].isna(), 'id'])
+        pandas_scored = self.score_jobs(candidates, filters, user_skills, len(candidates))
+        pandas_scored = pandas_scored[~pandas_scored['id'].isin(null_ids)]
+        sql_scored = sql_scored[~sql_scored['id'].isin(null_ids)]
+        merged = pandas_scored[['id', 'final_score']].merge(
+            sql_scored[['id', 'final_score']], on='id', suffixes=('_pandas', '_sql'))
+        max_diff = float((merged['final_score_pandas'] - merged['final_score_sql']).abs().max() or 0.0)
+        # Tied rows may come back in either order, so compare the ranked scores, not ids
+        same_rank = (pandas_scored['final_score'].round(9).tolist() ==
+                     sql_scored['final_score'].round(9).tolist())
+        return max_diff, same_rank, len(null_ids)
+
+    def search_jobs_batch(self, searches, limit=20):
+        """search_jobs for many (query, filters) or (query, filters, query_embedding) searches;
+        one embedding call and one SQL statement per SEARCH_BATCH_SIZE searches.
+        Returns DataFrames in input order."""
+        model = self.search_model()
+        results = [None] * len(searches)
+        pending = []
+        for i, (query, filters, *vector) in enumerate(searches):
+            filters = filters or {}
+            # Supplied vectors (user profiles) are from EMBEDDING_MODEL
+            vector = vector[0] if vector and model == self.embedding_model else None
+            key = self.result_key(query, filters, limit, 'batch', model, query_embedding=vector)
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                results[i] = cached.copy()
+            else:
+                pending.append((i, query, filters, key, vector))
+
+        if model != self.embedding_model:
+            # Mid-migration vectors live in job_embeddings; use the single-search path
+            for i, query, filters, _, _ in pending:
+                results[i] = self.search_jobs(query, filters, limit)
+            return results
+
+        batched = []
+        to_embed = [query for _, query, _, _, vector in pending if vector is None]
+        embedded = iter(self.embed_queries(to_embed, model) if to_embed else [])
+        embeddings = [next(embedded) if vector is None else vector for *_, vector in pending]
+        for (i, query, filters, key, _), embedding in zip(pending, embeddings):
+            if embedding is None:
+                results[i] = self.search_jobs(query, filters, limit)  # full-text fallback
+            else:
+                batched.append((i, query, filters, key, embedding))
+
+        for start in range(0, len(batched), config.SEARCH_BATCH_SIZE):
+            chunk = batched[start:start + config.SEARCH_BATCH_SIZE]
+            candidates = self._batch_candidates(chunk, limit * config.CANDIDATE_MULTIPLIER)
+            with metrics.span("scoring"):
+                scored = self._score_batch(candidates, chunk, limit)
+            # Phase two once for the whole chunk
+            ids = {job_id for jobs_df in scored if not jobs_df.empty for job_id in jobs_df['id']}
+            details = self.job_details(ids) if ids else pd.DataFrame()
+            for (i, _, _, key, _), jobs_df in zip(chunk, scored):
+                if not jobs_df.empty:
+                    jobs_df = jobs_df.drop(columns='description').merge(details, on='id', how='left')
+                results[i] = jobs_df
+                self.result_cache.set(key, jobs_df.copy())
+        return results
+
+    def _batch_candidates(self, searches, candidates):
+        """Vector candidates for every search in one statement: LATERAL ANN scan per VALUES row"""
+        dim = vector_storage.EMBEDDING_DIM
+        params = {"candidates": candidates}
+        if self.embedding_storage != 'vector':
+            params["candidates"] = candidates * self.rerank_multiplier
+        rows = []
+        for n, (_, _, filters, _, embedding) in enumerate(searches):
+            params[f"query_embedding_{n}"] = str(embedding)
+            for name, value in self._filter_values(filters).items():
+                params[f"{name}_{n}"] = value
+            rows.append(f"""({n}, CAST(:query_embedding_{n} AS vector({dim})),
+                CAST(:location_ids_{n} AS TEXT[]), CAST(:location_{n} AS TEXT),
+                CAST(:exp_min_{n} AS REAL), CAST(:exp_max_{n} AS REAL),
+                CAST(:experience_{n} AS TEXT), CAST(:user_skills_{n} AS TEXT[]))""")
+
+        stmt = f"""
+            WITH q (search_index, query_embedding, location_ids, location_pattern,
+                   exp_min, exp_max, experience_pattern, user_skills) AS (
+                VALUES {", ".join(rows)}
+            )
+            SELECT q.search_index, c.*
+            FROM q CROSS JOIN LATERAL (
+                SELECT {CANDIDATE_COLUMNS},
+                       1 - (embedding <=> q.query_embedding) as vector_score
+                FROM jobs
+                WHERE embedding IS NOT NULL AND {BATCH_FILTERS}
+                ORDER BY {vector_storage.ann_order(self.embedding_storage, 'q.query_embedding')}
+                LIMIT :candidates
+            ) c
+        """
+        with self.engine.connect() as conn:
+            with metrics.span("sql"):
+                vector_storage.apply_search_params(conn)
+                result = conn.execute(text(stmt), params)
+                rows = result.fetchall()
+            with metrics.span("dataframe"):
+                return pd.DataFrame(rows, columns=result.keys())
+
+    def _score_batch(self, jobs_df, searches, limit):
+        """score_jobs for every search at once with NumPy; one DataFrame per search"""
         if jobs_df.empty:
-            return "No jobs found matching your criteria."
-        
+            return [pd.DataFrame() for _ in searches]
+
+        user_skill_sets = []
+        role_terms = []
+        for _, query, filters, _, _ in searches:
+            user_skill_sets.append(set(filters.get('resume_skills') or self.extract_skills(query)))
+            role_terms.append((filters.get('role_type') or '').lower())
+        job_skill_sets = [set(stored) if isinstance(stored, list) else self.extract_skills(desc)
+                          for stored, desc in zip(jobs_df['skills'], jobs_df['description'])]
+
+        # Skill sets as boolean matrices over a shared vocabulary
+        vocab = np.array(sorted(set().union(*job_skill_sets, *user_skill_sets)), dtype=object)
+        position = {skill: i for i, skill in enumerate(vocab)}
+        job_matrix = np.zeros((len(job_skill_sets), len(vocab)), dtype=bool)
+        for row, skills in enumerate(job_skill_sets):
+            job_matrix[row, [position[s] for s in skills]] = True
+        user_matrix = np.zeros((len(searches), len(vocab)), dtype=bool)
+        for row, skills in enumerate(user_skill_sets):
+            user_matrix[row, [position[s] for s in skills]] = True
+
+        search_index = jobs_df['search_index'].to_numpy()
+        matched = job_matrix & user_matrix[search_index]
+        matched_count = matched.sum(axis=1)
+        job_count = np.maximum(job_matrix.sum(axis=1), 1)
+        user_count = user_matrix.sum(axis=1)[search_index]
+        skill_score = np.where(
+            matched_count > 0,
+            np.minimum(0.8 * matched_count / job_count + 0.2 * matched_count / np.maximum(user_count, 1), 1.0),
+            0.0
+        )
+
+        # Same weights as score_jobs: Role > Title > Vector similarity, then skills
+        row_terms = np.array(role_terms, dtype=object)[search_index]
+        has_role = row_terms != ''
+        titles = jobs_df['title'].fillna('').str.lower()
+        roles = jobs_df['role'].fillna('').str.lower()
+        title_match = np.fromiter((bool(t) and t in v for t, v in zip(row_terms, titles)), dtype=float, count=len(titles)) * 0.6
+        role_match = np.fromiter((bool(t) and t in v for t, v in zip(row_terms, roles)), dtype=float, count=len(roles)) * 0.5
+        vector_score = jobs_df['vector_score'].to_numpy(dtype=float)
+        final_score = np.where(has_role, title_match + role_match + vector_score * 0.3, vector_score)
+        has_skills = user_count > 0
+        final_score += np.where(has_skills, skill_score * 0.4 - (skill_score == 0) * 0.3, 0.0)
+
+        jobs_df = jobs_df.assign(
+            title_match=title_match,
+            role_match=role_match,
+            skill_score=np.where(has_skills, skill_score, 0.0),
+            matched_skills=[list(vocab[row]) for row in matched],
+            final_score=np.minimum(final_score, 0.90)
+        )
+        groups = dict(tuple(jobs_df.groupby('search_index')))
+        results = []
+        for n in range(len(searches)):
+            group = groups.get(n)
+            if group is None:
+                results.append(pd.DataFrame())
+                continue
+            results.append(group.drop(columns='search_index')
+                           .sort_values('final_score', ascending=False)
+                           .head(limit)
+                           .reset_index(drop=True))
+        return results
+
+    def _analysis_prompt(self, jobs_df, user_skills):
         user_skills_str = ", ".join(sorted(user_skills)) if user_skills else "None provided"
         top_jobs = jobs_df.head(4)
         
         # Find skills mentioned in job descriptions that user doesn't have
         all_job_skills = set()
         for _, row in top_jobs.iterrows():
-            job_skills = self.extract_skills(row['description'])
+            stored = row.get('skills')
+            job_skills = set(stored) if isinstance(stored, list) else self.extract_skills(row['description'])
             all_job_skills.update(job_skills)
         
         missing_skills = all_job_skills - user_skills
@@ -193,7 +838,7 @@ class JobRAG:
             for _, row in top_jobs.iterrows()
         ])
 
-        prompt = f"""User Current Skills: {user_skills_str}
+        return f"""User Current Skills: {user_skills_str}
 
 Top 4 Job Matches:
 {context}
@@ -209,62 +854,105 @@ Provide a brief analysis:
 
 Keep response under 150 words."""
 
+    def _fallback_analysis(self, jobs_df):
+        """Template analysis used when the LLM is unavailable"""
+        total_jobs = len(jobs_df)
+        top_job = jobs_df.iloc[0]
+        top_matched = top_job.get('matched_skills', [])
+        
+        response = f"Found {total_jobs} relevant positions. "
+        response += f"Best match: '{top_job['title']}' with {top_job['final_score']*100:.0f}% compatibility. "
+        if top_matched:
+            response += f"Strong skills match: {', '.join(top_matched[:3])}. "
+        response += "Consider developing related technologies for better matches."
+        return response
+
+    def _cached_analysis(self, prompt):
+        if not self.llm_cache:
+            return None
+        return self.llm_cache.get(config.LLM_MODEL, LLM_OPTIONS, prompt)
+
+    def _generate(self, prompt):
+        with metrics.span("llm"):
+            response = self.ollama.generate(prompt, config.LLM_MODEL, options=LLM_OPTIONS, timeout=200)
+        if response and self.llm_cache:
+            self.llm_cache.set(config.LLM_MODEL, LLM_OPTIONS, prompt, response)
+        return response
+
+    def generate_response(self, query, jobs_df, user_skills=None, budget_ms=None):
+        """LLM analysis of the results; the template summary if Ollama fails or misses budget_ms
+        (default LLM_BUDGET_MS)"""
+        if not user_skills:
+            user_skills = set()
+            
+        if jobs_df.empty:
+            return "No jobs found matching your criteria."
+        
+        prompt = self._analysis_prompt(jobs_df, user_skills)
+        cached = self._cached_analysis(prompt)
+        if cached:
+            return cached
+        budget_ms = config.LLM_BUDGET_MS if budget_ms is None else budget_ms
         try:
-            response = requests.post(
-                f"{self.ollama_url}/api/generate",
-                json={
-                    "model": "llama3.2:3b",
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "num_predict": 150,
-                        "temperature": 0.3,
-                        "num_threads": 6
-                    }
-                },
-                timeout=200
-            )
-            response.raise_for_status()
-            return response.json().get("response", "Analysis unavailable.")
+            response = _llm_pool.run(self._generate, budget_ms, prompt)
+            return response or "Analysis unavailable."
+        except FutureTimeout as e:
+            # The response is still cached when it arrives, so a retry gets it
+            print(f"LLM {str(e) or f'missed its {budget_ms} ms budget'}; using the template analysis")
+            metrics.record("llm_budget_miss", budget_ms)
+            return self._fallback_analysis(jobs_df)
         except Exception as e:
             print(f"LLM Error: {e}")
-            total_jobs = len(jobs_df)
-            top_job = jobs_df.iloc[0]
-            top_matched = top_job.get('matched_skills', [])
-            
-            response = f"Found {total_jobs} relevant positions. "
-            response += f"Best match: '{top_job['title']}' with {top_job['final_score']*100:.0f}% compatibility. "
-            if top_matched:
-                response += f"Strong skills match: {', '.join(top_matched[:3])}. "
-            response += "Consider developing related technologies for better matches."
-            return response
-
-    def chat(self, query, filters=None):
-        """Main chat interface"""
+            return self._fallback_analysis(jobs_df)
+
+    def generate_response_stream(self, query, jobs_df, user_skills=None):
+        """generate_response, yielding the analysis text as the model produces it"""
+        if jobs_df.empty:
+            yield "No jobs found matching your criteria."
+            return
+
+        prompt = self._analysis_prompt(jobs_df, user_skills or set())
+        cached = self._cached_analysis(prompt)
+        if cached:
+            yield cached
+            return
+
+        tokens = []
+        start = time.perf_counter()
         try:
-            filters = filters or {}
-            jobs = self.search_jobs(query, filters)
-            
-            if jobs.empty:
-                return {"response": "No relevant jobs found matching your criteria.", "jobs": []}
-            
-            user_skills = filters.get('resume_skills', set())
-            if not user_skills:
-                user_skills = self.extract_skills(query)
-            
-            response = self.generate_response(query, jobs, user_skills)
-            return {
-                "response": response,
-                "jobs": jobs.to_dict('records')
-            }
+            for token in self.ollama.generate_stream(prompt, config.LLM_MODEL, options=LLM_OPTIONS, timeout=200):
+                if not tokens:
+                    metrics.record("llm_first_token", (time.perf_counter() - start) * 1000)
+                tokens.append(token)
+                yield token
+            metrics.record("llm", (time.perf_counter() - start) * 1000)
         except Exception as e:
-            return {"response": f"Error: {str(e)}", "jobs": []}
+            print(f"LLM Error: {e}")
+            if not tokens:
+                yield self._fallback_analysis(jobs_df)
+            return
+        if not tokens:
+            yield "Analysis unavailable."
+        elif self.llm_cache:
+            self.llm_cache.set(config.LLM_MODEL, LLM_OPTIONS, prompt, "".join(tokens))
 
-    def chat(self, query, filters=None):
-        """Main chat interface"""
+    def chat(self, query, filters=None, with_timings=False, budget_ms=None):
+        """Main chat interface, answering within budget_ms (default CHAT_BUDGET_MS) by degrading
+        to full-text results and the template analysis; with_timings=True adds a per-stage
+        "timings" breakdown (ms)"""
+        if with_timings:
+            with metrics.collect() as timings:
+                result = self.chat(query, filters, budget_ms=budget_ms)
+            result["timings"] = timings
+            return result
+        budget_ms = config.CHAT_BUDGET_MS if budget_ms is None else budget_ms
+        start = time.perf_counter()
         try:
             filters = filters or {}
-            jobs = self.search_jobs(query, filters)
+            embedding_budget = config.EMBEDDING_BUDGET_MS
+            if budget_ms:
+                embedding_budget = min(embedding_budget or budget_ms, budget_ms)
+            jobs = self.search_jobs(query, filters, budget_ms=embedding_budget)
             
             if jobs.empty:
                 return {"response": "No relevant jobs found matching your criteria.", "jobs": []}
@@ -273,7 +961,11 @@ Keep response under 150 words."""
             if not user_skills:
                 user_skills = self.extract_skills(query)
             
-            response = self.generate_response(query, jobs, user_skills)
+            llm_budget = config.LLM_BUDGET_MS
+            if budget_ms:
+                remaining = max(budget_ms - (time.perf_counter() - start) * 1000, 1)
+                llm_budget = min(llm_budget or remaining, remaining)
+            response = self.generate_response(query, jobs, user_skills, budget_ms=llm_budget)
             return {
                 "response": response,
                 "jobs": jobs.to_dict('records')
@@ -282,14 +974,38 @@ Keep response under 150 words."""
             return {"response": f"Error: {str(e)}", "jobs": []}
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Job search demo')
+    parser.add_argument('--check-scoring', nargs='*', metavar='QUERY',
+                        help='Compare pandas and SQL scoring on the same candidates')
+    args = parser.parse_args()
     rag = JobRAG()
-    
+
+    if args.check_scoring is not None:
+        queries = args.check_scoring or ["data scientist jobs", "java developer using spring, sql",
+                                         "devops engineer using aws, kubernetes"]
+        checks = [
+            {},
+            {'role_type': 'Data Scientist', 'resume_skills': {'python', 'machine learning', 'sql'}},
+            {'location': 'Bangalore', 'experience': 'Junior (1-3y)'},
+        ]
+        failures = 0
+        for query in queries:
+            for filters in checks:
+                max_diff, same_rank, null_rows = rag.compare_scoring(query, filters)
+                ok = max_diff < 1e-6 and same_rank
+                failures += not ok
+                print(f"{'OK  ' if ok else 'FAIL'} {query!r} {sorted(filters)}: max diff {max_diff:.2e}, "
+                      f"same ranking {same_rank}, {null_rows} rows without skills skipped")
+        raise SystemExit(1 if failures else 0)
+
     print("Testing Job Search...")
     filters = {
         'location': 'Bangalore',
         'role_type': 'Data Scientist',
         'resume_skills': {'python', 'machine learning', 'sql'}
     }
-    result = rag.chat("Looking for data scientist jobs", filters)
+    result = rag.chat("Looking for data scientist jobs", filters, with_timings=True)
     print("Response:", result["response"])
-    print(f"\nFound {len(result['jobs'])} jobs")
\ No newline at end of file
+    print(f"\nFound {len(result['jobs'])} jobs")
+    print("Timings (ms):", {stage: round(ms, 1) for stage, ms in result["timings"].items()})
\ No newline at end of file
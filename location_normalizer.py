@@ -0,0 +1,94 @@
+from skill_matcher import PhraseMatcher
+
+# city id: (aliases, state id, region id or None)
+CITIES = {
+    'bangalore': (['bangalore', 'bengaluru', 'banglore', 'bengalore', 'blr'], 'karnataka', None),
+    'mysore': (['mysore', 'mysuru'], 'karnataka', None),
+    'mangalore': (['mangalore', 'mangaluru'], 'karnataka', None),
+    'hyderabad': (['hyderabad', 'hyd', 'secunderabad'], 'telangana', None),
+    'chennai': (['chennai', 'madras'], 'tamil-nadu', None),
+    'coimbatore': (['coimbatore', 'kovai'], 'tamil-nadu', None),
+    'madurai': (['madurai'], 'tamil-nadu', None),
+    'mumbai': (['mumbai', 'bombay', 'navi mumbai', 'thane'], 'maharashtra', None),
+    'pune': (['pune', 'poona'], 'maharashtra', None),
+    'nagpur': (['nagpur'], 'maharashtra', None),
+    'delhi': (['delhi', 'new delhi'], 'delhi', 'delhi-ncr'),
+    'noida': (['noida', 'greater noida'], 'uttar-pradesh', 'delhi-ncr'),
+    'gurgaon': (['gurgaon', 'gurugram'], 'haryana', 'delhi-ncr'),
+    'ghaziabad': (['ghaziabad'], 'uttar-pradesh', 'delhi-ncr'),
+    'faridabad': (['faridabad'], 'haryana', 'delhi-ncr'),
+    'kolkata': (['kolkata', 'calcutta'], 'west-bengal', None),
+    'ahmedabad': (['ahmedabad', 'amdavad'], 'gujarat', None),
+    'vadodara': (['vadodara', 'baroda'], 'gujarat', None),
+    'surat': (['surat'], 'gujarat', None),
+    'kochi': (['kochi', 'cochin', 'ernakulam'], 'kerala', None),
+    'trivandrum': (['trivandrum', 'thiruvananthapuram'], 'kerala', None),
+    'jaipur': (['jaipur'], 'rajasthan', None),
+    'chandigarh': (['chandigarh', 'mohali', 'panchkula'], 'punjab', None),
+    'indore': (['indore'], 'madhya-pradesh', None),
+    'bhopal': (['bhopal'], 'madhya-pradesh', None),
+    'lucknow': (['lucknow'], 'uttar-pradesh', None),
+    'bhubaneswar': (['bhubaneswar', 'bhubaneshwar'], 'odisha', None),
+    'visakhapatnam': (['visakhapatnam', 'vizag'], 'andhra-pradesh', None),
+    'vijayawada': (['vijayawada'], 'andhra-pradesh', None),
+}
+
+STATES = {
+    'karnataka': ['karnataka'],
+    'telangana': ['telangana'],
+    'tamil-nadu': ['tamil nadu', 'tamilnadu'],
+    'maharashtra': ['maharashtra'],
+    'delhi': [],
+    'uttar-pradesh': ['uttar pradesh'],
+    'haryana': ['haryana'],
+    'west-bengal': ['west bengal'],
+    'gujarat': ['gujarat'],
+    'kerala': ['kerala'],
+    'rajasthan': ['rajasthan'],
+    'punjab': ['punjab'],
+    'madhya-pradesh': ['madhya pradesh'],
+    'odisha': ['odisha', 'orissa'],
+    'andhra-pradesh': ['andhra pradesh'],
+}
+
+REGIONS = {
+    'delhi-ncr': ['ncr', 'delhi ncr', 'delhi / ncr'],
+    'remote': ['remote', 'work from home', 'wfh', 'anywhere'],
+    'pan-india': ['pan india', 'pan - india', 'all india', 'across india', 'anywhere in india', 'multiple locations'],
+}
+
+# Jobs open anywhere in India satisfy any city or state filter
+PAN_INDIA = 'pan-india'
+
+
+def _build():
+    aliases = {}
+    parents = {}
+    for city, (names, state, region) in CITIES.items():
+        aliases[city] = names
+        parents[city] = [p for p in (state, region) if p]
+    for state, names in STATES.items():
+        aliases.setdefault(state, []).extend(names)
+    for region, names in REGIONS.items():
+        aliases.setdefault(region, []).extend(names)
+    return PhraseMatcher(aliases), parents
+
+
+_matcher, _parents = _build()
+
+
+def canonical_locations(text):
+    """Canonical location ids in free text, including each city's state and region"""
+    found = _matcher.extract(text)
+    for location in list(found):
+        found.update(_parents.get(location, []))
+    return sorted(found)
+
+
+def location_filter_ids(text):
+    """Ids a job's locations must overlap for a user's location filter; empty if unknown"""
+    # Only the places named: a "Bangalore" filter should not widen to all of Karnataka
+    ids = _matcher.extract(text)
+    if ids and ids != {'remote'}:
+        ids.add(PAN_INDIA)
+    return sorted(ids)
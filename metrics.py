@@ -0,0 +1,113 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds in milliseconds; the last bucket is unbounded
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000, float('inf'))
+
+_current_timings = contextvars.ContextVar('current_timings', default=None)
+
+
+class LatencyHistogram:
+    """Thread-safe fixed-bucket latency histogram"""
+
+    def __init__(self, buckets=BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, ms):
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if ms <= bound:
+                    self.counts[i] += 1
+                    break
+            self.count += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (capped at the observed max)"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            target = q * self.count
+            seen = 0
+            for bound, n in zip(self.buckets, self.counts):
+                seen += n
+                if seen >= target:
+                    return min(bound, self.max_ms)
+            return self.max_ms
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total_ms / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": self.max_ms
+        }
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+def histogram(stage):
+    with _histograms_lock:
+        if stage not in _histograms:
+            _histograms[stage] = LatencyHistogram()
+        return _histograms[stage]
+
+
+def record(stage, ms):
+    """Add a duration to the stage histogram and to the active per-request breakdown"""
+    histogram(stage).observe(ms)
+    timings = _current_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + ms
+
+
+@contextmanager
+def span(stage):
+    """Time the enclosed block as `stage`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, (time.perf_counter() - start) * 1000)
+
+
+@contextmanager
+def collect():
+    """Gather a {stage: ms} breakdown of every span inside the block"""
+    timings = {}
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+def snapshot():
+    """Per-stage latency summary for every stage seen so far"""
+    with _histograms_lock:
+        stages = dict(_histograms)
+    return {stage: hist.summary() for stage, hist in sorted(stages.items())}
+
+
+def reset():
+    with _histograms_lock:
+        _histograms.clear()
+
+
+def report():
+    print(f"{'stage':<12} {'count':>7} {'mean ms':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>9}")
+    for stage, s in snapshot().items():
+        print(f"{stage:<12} {s['count']:>7} {s['mean_ms']:>9.1f} {s['p50_ms']:>8.0f} "
+              f"{s['p95_ms']:>8.0f} {s['p99_ms']:>8.0f} {s['max_ms']:>9.1f}")
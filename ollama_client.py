@@ -0,0 +1,264 @@
+import asyncio
+import json
+import random
+import threading
+import time
+import httpx
+import requests
+import config
+
+
+class OllamaUnavailable(Exception):
+    """Raised when no Ollama endpoint could serve a request"""
+
+
+class _Endpoint:
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.outstanding = 0
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+
+    def available(self, now):
+        """Closed circuit, or open circuit whose cooldown passed (one half-open probe)"""
+        if self.failures < config.OLLAMA_BREAKER_FAILURES:
+            return True
+        return now >= self.open_until and not self.probing
+
+
+class OllamaClient:
+    """Least-outstanding-requests Ollama client with per-endpoint circuit breakers"""
+
+    def __init__(self, endpoints=None, health_interval=None):
+        urls = endpoints or config.OLLAMA_URLS
+        self.endpoints = [_Endpoint(url) for url in urls]
+        self.lock = threading.Lock()
+        self.health_interval = config.OLLAMA_HEALTH_INTERVAL if health_interval is None else health_interval
+        self._health_thread = None
+        if self.health_interval and len(self.endpoints) > 1:
+            self._health_thread = threading.Thread(target=self._health_loop, daemon=True)
+            self._health_thread.start()
+
+    def _acquire(self, tried):
+        with self.lock:
+            now = time.monotonic()
+            candidates = [ep for ep in self.endpoints if ep not in tried and ep.available(now)]
+            if not candidates:
+                return None
+            least = min(ep.outstanding for ep in candidates)
+            endpoint = random.choice([ep for ep in candidates if ep.outstanding == least])
+            if endpoint.failures >= config.OLLAMA_BREAKER_FAILURES:
+                endpoint.probing = True
+            endpoint.outstanding += 1
+            return endpoint
+
+    def _release(self, endpoint, ok):
+        """ok=None (request cancelled) leaves the circuit as it was"""
+        with self.lock:
+            endpoint.outstanding -= 1
+            endpoint.probing = False
+            if ok:
+                endpoint.failures = 0
+            elif ok is not None:
+                endpoint.failures += 1
+                if endpoint.failures >= config.OLLAMA_BREAKER_FAILURES:
+                    endpoint.open_until = time.monotonic() + config.OLLAMA_BREAKER_COOLDOWN
+
+    def any_available(self):
+        """False while every endpoint's circuit is open"""
+        with self.lock:
+            now = time.monotonic()
+            return any(ep.available(now) for ep in self.endpoints)
+
+    def _send(self, path, payload, timeout, stream):
+        """(response, endpoint) from the best available endpoint, failing over to the others;
+        the caller releases the endpoint's slot"""
+        tried = []
+        last_error = None
+        while True:
+            endpoint = self._acquire(tried)
+            if endpoint is None:
+                break
+            tried.append(endpoint)
+            try:
+                response = requests.post(
+                    f"{endpoint.url}{path}",
+                    json=payload,
+                    timeout=(config.OLLAMA_CONNECT_TIMEOUT, timeout),
+                    stream=stream
+                )
+                if response.status_code >= 500:
+                    response.raise_for_status()
+            except requests.RequestException as e:
+                self._release(endpoint, ok=False)
+                last_error = e
+                continue
+            return response, endpoint
+        raise OllamaUnavailable(f"No Ollama endpoint available: {last_error}")
+
+    def endpoint_status(self):
+        """{url: circuit closed} from request outcomes and the health thread; no network calls"""
+        with self.lock:
+            return {ep.url: ep.failures < config.OLLAMA_BREAKER_FAILURES for ep in self.endpoints}
+
+    def post(self, path, payload, timeout=60):
+        """POST to the best available endpoint, failing over to the others"""
+        response, endpoint = self._send(path, payload, timeout, stream=False)
+        self._release(endpoint, ok=True)
+        response.raise_for_status()
+        return response
+
+    def embed(self, text, model=None, timeout=60):
+        response = self.post(
+            "/api/embeddings",
+            {"model": model or config.EMBEDDING_MODEL, "prompt": text},
+            timeout=timeout
+        )
+        return response.json()["embedding"]
+
+    def embed_batch(self, texts, model=None, timeout=120):
+        """Embeddings for many texts in one /api/embed call, in input order"""
+        response = self.post(
+            "/api/embed",
+            {"model": model or config.EMBEDDING_MODEL, "input": list(texts)},
+            timeout=timeout
+        )
+        return response.json()["embeddings"]
+
+    def generate(self, prompt, model, options=None, timeout=200):
+        response = self.post(
+            "/api/generate",
+            {"model": model, "prompt": prompt, "stream": False, "options": options or {}},
+            timeout=timeout
+        )
+        return response.json().get("response")
+
+    def generate_stream(self, prompt, model, options=None, timeout=200):
+        """Yield response text as Ollama generates it; timeout applies between chunks"""
+        response, endpoint = self._send(
+            "/api/generate",
+            {"model": model, "prompt": prompt, "stream": True, "options": options or {}},
+            timeout,
+            stream=True
+        )
+        if response.status_code >= 400:
+            self._release(endpoint, ok=True)
+            response.raise_for_status()
+        # The endpoint counts as busy until the stream ends; a host dying mid-stream is a failure
+        ok = None
+        try:
+            with response:
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("response"):
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        break
+            ok = True
+        except (requests.RequestException, ValueError):
+            ok = False
+            raise
+        finally:
+            self._release(endpoint, ok)
+
+    def health_check(self):
+        """Ping every endpoint and update its circuit; returns {url: healthy}"""
+        status = {}
+        for endpoint in self.endpoints:
+            try:
+                requests.get(f"{endpoint.url}/api/tags", timeout=config.OLLAMA_CONNECT_TIMEOUT).raise_for_status()
+                healthy = True
+            except requests.RequestException:
+                healthy = False
+            with self.lock:
+                if healthy:
+                    endpoint.failures = 0
+                elif endpoint.failures < config.OLLAMA_BREAKER_FAILURES:
+                    endpoint.failures = config.OLLAMA_BREAKER_FAILURES
+                    endpoint.open_until = time.monotonic() + config.OLLAMA_BREAKER_COOLDOWN
+            status[endpoint.url] = healthy
+        return status
+
+    def _health_loop(self):
+        while True:
+            time.sleep(self.health_interval)
+            self.health_check()
+
+
+class AsyncOllamaClient(OllamaClient):
+    """OllamaClient for event loops over httpx, with the same endpoint selection and breakers"""
+
+    def __init__(self, endpoints=None, health_interval=None):
+        super().__init__(endpoints, health_interval)
+        self.http = httpx.AsyncClient()
+
+    async def post(self, path, payload, timeout=60):
+        tried = []
+        last_error = None
+        while True:
+            endpoint = self._acquire(tried)
+            if endpoint is None:
+                break
+            tried.append(endpoint)
+            try:
+                response = await self.http.post(
+                    f"{endpoint.url}{path}",
+                    json=payload,
+                    timeout=httpx.Timeout(timeout, connect=config.OLLAMA_CONNECT_TIMEOUT)
+                )
+                if response.status_code >= 500:
+                    response.raise_for_status()
+            except httpx.HTTPError as e:
+                self._release(endpoint, ok=False)
+                last_error = e
+                continue
+            except asyncio.CancelledError:
+                self._release(endpoint, ok=None)
+                raise
+            self._release(endpoint, ok=True)
+            response.raise_for_status()
+            return response
+        raise OllamaUnavailable(f"No Ollama endpoint available: {last_error}")
+
+    async def embed(self, text, model=None, timeout=60):
+        response = await self.post(
+            "/api/embeddings",
+            {"model": model or config.EMBEDDING_MODEL, "prompt": text},
+            timeout=timeout
+        )
+        return response.json()["embedding"]
+
+    async def embed_batch(self, texts, model=None, timeout=120):
+        response = await self.post(
+            "/api/embed",
+            {"model": model or config.EMBEDDING_MODEL, "input": list(texts)},
+            timeout=timeout
+        )
+        return response.json()["embeddings"]
+
+    async def generate(self, prompt, model, options=None, timeout=200):
+        response = await self.post(
+            "/api/generate",
+            {"model": model, "prompt": prompt, "stream": False, "options": options or {}},
+            timeout=timeout
+        )
+        return response.json().get("response")
+
+    async def aclose(self):
+        await self.http.aclose()
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide client shared by JobRAG and JobProcessor"""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = OllamaClient()
+        return _default_client
@@ -24,5 +24,104 @@ CREATE TABLE IF NOT EXISTS jobs (
 CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_unique_title_url 
 ON jobs (title, apply_url);
 
+-- HNSW needs no training data, so it can be created on the empty table.
+-- Rebuild/resize with: python vector_storage.py build-index
 CREATE INDEX IF NOT EXISTS idx_jobs_embedding 
-ON jobs USING ivfflat (embedding vector_cosine_ops);
\ No newline at end of file
+ON jobs USING hnsw (embedding vector_cosine_ops);
+
+-- Work queue lease columns: embedding workers claim rows with
+-- FOR UPDATE SKIP LOCKED so several processes/hosts can drain the backlog
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS lease_owner VARCHAR(100);
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP WITHOUT TIME ZONE;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0;
+-- content_hash the attempts were counted against; an edited posting starts over
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS attempts_hash CHAR(32);
+
+-- Change detection: content_hash always reflects the current title/description,
+-- embedded_hash the text the stored embedding was computed from
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS content_hash CHAR(32)
+    GENERATED ALWAYS AS (md5(title || ' ' || COALESCE(description, ''))) STORED;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS embedded_hash CHAR(32);
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS embedding_model VARCHAR(100);
+
+-- Existing embeddings were computed from the current text with the default model
+UPDATE jobs SET embedded_hash = content_hash, embedding_model = 'nomic-embed-text:v1.5'
+WHERE embedding IS NOT NULL AND embedded_hash IS NULL;
+
+DROP INDEX IF EXISTS idx_jobs_pending;
+CREATE INDEX IF NOT EXISTS idx_jobs_pending_hash
+ON jobs (updated_at)
+WHERE embedding IS NULL OR role IS NULL OR embedded_hash IS DISTINCT FROM content_hash;
+
+-- Embeddings for additional models, used to migrate to a new embedding model
+-- without a search outage (see embedding_migration.py)
+CREATE TABLE IF NOT EXISTS job_embeddings (
+    job_id UUID REFERENCES jobs(id) ON DELETE CASCADE,
+    model VARCHAR(100) NOT NULL,
+    embedding vector NOT NULL,
+    content_hash CHAR(32),
+    updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY(job_id, model)
+);
+
+-- Shared query embedding cache (used when QUERY_CACHE_PERSIST=true)
+CREATE TABLE IF NOT EXISTS query_embedding_cache (
+    model VARCHAR(100) NOT NULL,
+    query_key TEXT NOT NULL,
+    embedding vector NOT NULL,
+    created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY(model, query_key)
+);
+
+-- Skills extracted at ingest time; skills_version is the vocabulary fingerprint
+-- they were extracted with (see skill_matcher.py)
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS skills TEXT[];
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS skills_version VARCHAR(16);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_skills ON jobs USING gin (skills);
+
+-- Structured attributes parsed from free text at ingest (see experience_parser.py)
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS exp_min_years REAL;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS exp_max_years REAL;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS is_fresher BOOLEAN NOT NULL DEFAULT FALSE;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS attributes_version INTEGER;
+
+CREATE INDEX IF NOT EXISTS idx_jobs_experience ON jobs (exp_min_years, exp_max_years);
+CREATE INDEX IF NOT EXISTS idx_jobs_fresher ON jobs (is_fresher) WHERE is_fresher;
+
+-- Canonical location ids (city, state, region, 'remote', 'pan-india'; see location_normalizer.py)
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS locations TEXT[];
+
+CREATE INDEX IF NOT EXISTS idx_jobs_locations ON jobs USING gin (locations);
+-- Full-text search over title (A), role (B) and description (C) for lexical
+-- retrieval, fused with vector search and used alone when Ollama is down
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS search_tsv tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', COALESCE(title, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(role, '')), 'B') ||
+        setweight(to_tsvector('english', COALESCE(description, '')), 'C')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_jobs_search_tsv ON jobs USING gin (search_tsv);
+
+-- Single-row ingest counter; the pipeline bumps it after processing new jobs
+-- and cached search results from an older generation are discarded
+CREATE TABLE IF NOT EXISTS ingest_state (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    generation BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO ingest_state (id) VALUES (TRUE) ON CONFLICT (id) DO NOTHING;
+
+-- LLM responses keyed by sha256 of (model, options, prompt); JobRAG evicts
+-- by age (LLM_CACHE_TTL) and least recent use (LLM_CACHE_SIZE)
+CREATE TABLE IF NOT EXISTS llm_response_cache (
+    cache_key CHAR(64) PRIMARY KEY,
+    model VARCHAR(100) NOT NULL,
+    response TEXT NOT NULL,
+    created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    last_used_at TIMESTAMP WITHOUT TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_llm_response_cache_last_used ON llm_response_cache (last_used_at);
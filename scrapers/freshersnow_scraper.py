@@ -3,11 +3,11 @@ from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
 import pandas as pd
 import time
-from sqlalchemy import create_engine
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import config
+from db import get_engine
 
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
@@ -228,7 +228,7 @@ def scrape_freshersnow():
     print(f"Scraping completed. Total jobs: {len(df)}")
     
     # Save to database
-    engine = create_engine(config.DB_URL)
+    engine = get_engine()
     df.to_sql(
         name="jobs",
         con=engine,
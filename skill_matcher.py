@@ -0,0 +1,153 @@
+import hashlib
+import re
+
+TECH_SKILLS = {
+    'python', 'java', 'javascript', 'typescript', 'c++', 'c#', 'go', 'rust', 'php', 'ruby', 'scala', 'kotlin', 'swift', 'dart', 'r', 'julia',
+    'react', 'angular', 'vue', 'svelte', 'next.js', 'nuxt.js', 'node', 'express', 'nestjs', 'django', 'flask', 'fastapi', 'spring', 'asp.net', 'laravel', 'rails',
+    'sql', 'mysql', 'postgresql', 'mongodb', 'redis', 'elasticsearch', 'cassandra', 'dynamodb', 'mariadb', 'sqlite', 'neo4j', 'couchbase',
+    'aws', 'azure', 'gcp', 'digitalocean', 'firebase', 'devops', 'docker', 'kubernetes', 'jenkins', 'terraform', 'ansible', 'helm', 'istio', 'github actions', 'circleci',
+    'machine learning', 'deep learning', 'nlp', 'computer vision', 'pytorch', 'tensorflow', 'keras', 'scikit-learn', 'pandas', 'numpy', 'matplotlib', 'seaborn', 'opencv', 'huggingface', 'llm', 'langchain', 'vector database',
+    'git', 'github', 'gitlab', 'bitbucket', 'jira', 'confluence', 'agile', 'scrum', 'kanban',
+    'html', 'css', 'sass', 'less', 'bootstrap', 'tailwind', 'material-ui', 'figma', 'adobe xd',
+    'linux', 'unix', 'bash', 'shell', 'powershell',
+    'data analysis', 'data engineering', 'data visualization', 'tableau', 'power bi', 'looker', 'metabase',
+    'big data', 'hadoop', 'hive', 'hbase', 'pig', 'spark', 'pyspark', 'airflow', 'sqoop', 'kafka', 'flink', 'snowflake', 'databricks', 'presto', 'trino', 'redshift', 'bigquery', 'dbt', 'clickhouse', 'druid', 'iceberg', 'delta lake',
+    'selenium', 'cypress', 'playwright', 'jest', 'mocha', 'junit', 'pytest',
+    'rest api', 'graphql', 'grpc', 'microservices', 'serverless', 'web3', 'solidity', 'ethereum', 'smart contracts',
+    'cybersecurity', 'penetration testing', 'iam', 'oauth', 'jwt', 'flutter', 'react native', 'ionic'
+}
+
+# Alternative spellings that map to a canonical skill
+SKILL_SYNONYMS = {
+    "spark": ["spark", "pyspark"],
+    "power bi": ["power bi", "powerbi"],
+    "machine learning": ["machine learning", "machinelearning", "ml"],
+    "deep learning": ["deep learning", "deeplearning", "dl"],
+    "javascript": ["java script", "javascript", "js"],
+    "typescript": ["type script", "typescript", "ts"],
+    "postgresql": ["postgres", "postgresql"],
+    "mysql": ["my sql", "mysql"],
+    "c++": ["c++"],
+    "c#": ["c#", "c sharp"],
+}
+
+# Words are matched whole; punctuation is kept so "c++", "next.js" and "asp.net" match too
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+class PhraseMatcher:
+    """Finds every known phrase in one pass over the text using a token trie"""
+
+    def __init__(self, aliases):
+        # aliases: {canonical name: [phrases that map to it]}
+        self.trie = {}
+        for name, phrases in aliases.items():
+            for phrase in phrases:
+                self._add(phrase, name)
+
+    def _add(self, phrase, name):
+        node = self.trie
+        for token in TOKEN_PATTERN.findall(phrase.lower()):
+            node = node.setdefault(token, {})
+        node.setdefault(None, set()).add(name)
+
+    def extract(self, text):
+        if not text:
+            return set()
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        trie = self.trie
+        found = set()
+        for i, token in enumerate(tokens):
+            node = trie.get(token)
+            j = i + 1
+            while node is not None:
+                skills = node.get(None)
+                if skills:
+                    found.update(skills)
+                if j == len(tokens):
+                    break
+                node = node.get(tokens[j])
+                j += 1
+        return found
+
+
+class SkillMatcher(PhraseMatcher):
+    """Skill extractor over TECH_SKILLS with SKILL_SYNONYMS folded in"""
+
+    def __init__(self, skills=None, synonyms=None):
+        skills = TECH_SKILLS if skills is None else skills
+        synonyms = SKILL_SYNONYMS if synonyms is None else synonyms
+        aliases = {skill: list(synonyms.get(skill, [skill])) for skill in skills}
+        for skill, phrases in synonyms.items():
+            aliases.setdefault(skill, []).extend(phrases)
+        super().__init__(aliases)
+
+
+def vocabulary_version(skills=None, synonyms=None):
+    """Short fingerprint of the vocabulary; stored skill sets older than it get refreshed"""
+    skills = TECH_SKILLS if skills is None else skills
+    synonyms = SKILL_SYNONYMS if synonyms is None else synonyms
+    payload = repr((sorted(skills), sorted((k, sorted(v)) for k, v in synonyms.items())))
+    return hashlib.md5(payload.encode()).hexdigest()[:12]
+
+
+SKILL_VOCAB_VERSION = vocabulary_version()
+
+_default_matcher = SkillMatcher()
+
+
+def extract_skills(text):
+    """Skills found in text using the default vocabulary"""
+    return _default_matcher.extract(text)
+
+
+if __name__ == "__main__":
+    # Benchmark against the previous per-skill regex extractor on stored descriptions
+    import argparse
+    import time
+    from sqlalchemy import text as sql
+    from db import get_engine
+
+    parser = argparse.ArgumentParser(description='Skill extractor benchmark')
+    parser.add_argument('--samples', type=int, default=500)
+    args = parser.parse_args()
+
+    legacy_patterns = {
+        skill: r"\b(" + "|".join(r"\s*".join(map(re.escape, p.split())) for p in phrases) + r")\b"
+        for skill, phrases in SKILL_SYNONYMS.items()
+    }
+
+    def legacy_extract(text):
+        text_lower = text.lower()
+        found = set()
+        for skill, pattern in legacy_patterns.items():
+            if re.search(pattern, text_lower):
+                found.add(skill)
+        for skill in TECH_SKILLS:
+            if skill in legacy_patterns:
+                continue
+            if re.search(r'\b' + re.escape(skill) + r'\b', text_lower):
+                found.add(skill)
+        return found
+
+    engine = get_engine()
+    with engine.connect() as conn:
+        descriptions = [row[0] for row in conn.execute(
+            sql("SELECT description FROM jobs WHERE description IS NOT NULL ORDER BY random() LIMIT :n"),
+            {"n": args.samples}
+        )]
+
+    start = time.perf_counter()
+    legacy = [legacy_extract(d) for d in descriptions]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matched = [extract_skills(d) for d in descriptions]
+    matcher_time = time.perf_counter() - start
+
+    agree = sum(a == b for a, b in zip(legacy, matched))
+    print(f"{len(descriptions)} descriptions")
+    print(f"regex:   {legacy_time * 1000 / max(len(descriptions), 1):.3f} ms/doc")
+    print(f"matcher: {matcher_time * 1000 / max(len(descriptions), 1):.3f} ms/doc "
+          f"({legacy_time / max(matcher_time, 1e-9):.0f}x faster)")
+    print(f"identical skill sets: {agree}/{len(descriptions)}")
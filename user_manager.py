@@ -1,17 +1,45 @@
+import hashlib
+import json
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 import pandas as pd
 from datetime import datetime, timedelta
 import schedule
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import config
+from db import get_engine
+from ollama_client import get_client
+
+# Resume characters embedded into a profile (stays within the embedding model's context)
+PROFILE_RESUME_CHARS = 6000
+
+def profile_text(resume_text, location=None, role_name=None, skills=None):
+    """Text embedded as a user's profile: the preference query the app builds, then the resume"""
+    parts = []
+    if role_name:
+        parts.append(f"{role_name} jobs")
+    if location:
+        parts.append(f"in {location}")
+    if skills:
+        parts.append(f"using {', '.join(sorted(skills))}")
+    text_parts = [" ".join(parts), (resume_text or "")[:PROFILE_RESUME_CHARS]]
+    return "\n\n".join(p for p in text_parts if p.strip())
+
+def profile_hash(profile):
+    return hashlib.md5(profile.encode()).hexdigest()
+
+# Profile re-embeds run off the request path; searches use the stored vector once it is ready
+_profile_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='profile-embed')
+_profile_pending = set()
+_profile_pending_lock = threading.Lock()
 
 class UserManager:
     def __init__(self, db_url=None):
-        self.engine = create_engine(db_url or config.DB_URL)
+        self.engine = get_engine(db_url)
         self.smtp_server = 'smtp.gmail.com'
         self.smtp_port = 587
         self.email_user = config.EMAIL_USER
@@ -89,6 +117,7 @@ class UserManager:
                 'skills': preferences.get('skills', [])
             })
             conn.commit()
+        self.refresh_profile_embedding_later(user_id)
 
     def get_user_preferences(self, user_id):
         """Get user preferences from users table"""
@@ -97,21 +126,104 @@ class UserManager:
             result = conn.execute(stmt, {'user_id': user_id})
             return result.fetchone()
 
-    def save_user_resume(self, user_id, filename, resume_blob, extracted_skills):
+    def save_user_resume(self, user_id, filename, resume_blob, extracted_skills, resume_text=None):
         """Save resume directly in users table"""
         with self.engine.connect() as conn:
             stmt = text("""
                 UPDATE users SET
                     resume_blob = :resume_blob,
-                    skills = :extracted_skills
+                    skills = :extracted_skills,
+                    resume_text = COALESCE(:resume_text, resume_text)
                 WHERE id = :user_id
             """)
             conn.execute(stmt, {
                 'user_id': user_id,
                 'resume_blob': resume_blob,
-                'extracted_skills': extracted_skills
+                'extracted_skills': extracted_skills,
+                'resume_text': resume_text
             })
             conn.commit()
+        self.refresh_profile_embedding_later(user_id)
+
+    def _profile_row(self, conn, user_id):
+        return conn.execute(text("""
+            SELECT resume_text, location, role_name, skills,
+                   profile_embedding::text AS profile_embedding, profile_hash, profile_embedding_model
+            FROM users WHERE id = :user_id
+        """), {'user_id': user_id}).fetchone()
+
+    @staticmethod
+    def current_profile_embedding(row, location=None, role_name=None, skills=None):
+        """Stored profile vector if it was embedded from exactly this profile with the
+        current model, else None. Preferences default to the stored ones."""
+        if row is None or row.profile_embedding is None or row.profile_embedding_model != config.EMBEDDING_MODEL:
+            return None
+        profile = profile_text(
+            row.resume_text,
+            row.location if location is None else location,
+            row.role_name if role_name is None else role_name,
+            row.skills if skills is None else skills
+        )
+        if not profile or profile_hash(profile) != row.profile_hash:
+            return None
+        return json.loads(row.profile_embedding)
+
+    def get_profile_embedding(self, user_id, preferences=None):
+        """Profile vector for a search with these preferences, or None if it needs re-embedding"""
+        preferences = preferences or {}
+        with self.engine.connect() as conn:
+            row = self._profile_row(conn, user_id)
+        return self.current_profile_embedding(
+            row, preferences.get('location'), preferences.get('role_name'), preferences.get('skills')
+        )
+
+    def refresh_profile_embedding_later(self, user_id):
+        """refresh_profile_embedding in the background, without waiting for Ollama; a refresh
+        still queued for the user already reads the latest profile, so none is added"""
+        with _profile_pending_lock:
+            if user_id in _profile_pending:
+                return None
+            _profile_pending.add(user_id)
+
+        def refresh():
+            with _profile_pending_lock:
+                _profile_pending.discard(user_id)
+            return self.refresh_profile_embedding(user_id)
+
+        return _profile_executor.submit(refresh)
+
+    def refresh_profile_embedding(self, user_id):
+        """Embed the user's resume + preferences when they changed since the last embedding"""
+        with self.engine.connect() as conn:
+            row = self._profile_row(conn, user_id)
+        if row is None:
+            return None
+        profile = profile_text(row.resume_text, row.location, row.role_name, row.skills)
+        if not profile:
+            return None
+        digest = profile_hash(profile)
+        if digest == row.profile_hash and row.profile_embedding_model == config.EMBEDDING_MODEL:
+            return json.loads(row.profile_embedding) if row.profile_embedding else None
+        try:
+            embedding = get_client().embed(profile, config.EMBEDDING_MODEL, timeout=60)
+        except Exception as e:
+            print(f"Profile embedding error: {e}")
+            return None
+        with self.engine.begin() as conn:
+            conn.execute(text("""
+                UPDATE users SET
+                    profile_embedding = :embedding,
+                    profile_embedding_model = :model,
+                    profile_hash = :profile_hash,
+                    profile_updated_at = NOW()
+                WHERE id = :user_id
+            """), {
+                'user_id': user_id,
+                'embedding': str(embedding),
+                'model': config.EMBEDDING_MODEL,
+                'profile_hash': digest
+            })
+        return embedding
 
     def save_job(self, user_id, job_id, final_score=0.0, matched_skills=None):
         """Save a job for user with its match score and skills"""
@@ -135,7 +247,10 @@ class UserManager:
         """Get user's saved jobs including match details"""
         with self.engine.connect() as conn:
             stmt = text("""
-                SELECT j.*, sj.final_score, sj.matched_skills FROM jobs j
+                SELECT j.id, j.title, j.description, j.location, j.experience,
+                       j.listing_url, j.apply_url, j.posted_date, j.source, j.role,
+                       sj.final_score, sj.matched_skills
+                FROM jobs j
                 JOIN saved_jobs sj ON j.id = sj.job_id
                 WHERE sj.user_id = :user_id
                 ORDER BY sj.saved_at DESC
@@ -173,13 +288,16 @@ class UserManager:
         
         with self.engine.connect() as conn:
             users_stmt = text("""
-                SELECT id, email, username, location, role_name, skills
+                SELECT id, email, username, location, role_name, skills,
+                       resume_text, profile_embedding::text AS profile_embedding,
+                       profile_hash, profile_embedding_model
                 FROM users 
                 WHERE location IS NOT NULL OR role_name IS NOT NULL
             """)
             users_result = conn.execute(users_stmt)
             users = users_result.fetchall()
 
+            searches = []
             for user in users:
                 # Build query from user preferences
                 query_parts = []
@@ -198,24 +316,31 @@ class UserManager:
                     'role_type': user.role_name,
                     'resume_skills': set(user.skills) if user.skills else set()
                 }
-                
-                # Get top 5 jobs using RAG logic
-                top_jobs = rag.search_jobs(query, filters, limit=5)
-                
+                # Users with a current profile embedding need no query embedding at all
+                searches.append((query, filters, self.current_profile_embedding(user)))
+
+            # Top 5 jobs for every user: one embedding call and one SQL statement per batch
+            results = rag.search_jobs_batch(searches, limit=5)
+
+            notified = set()
+            job_ids = {str(job_id) for top_jobs in results if not top_jobs.empty for job_id in top_jobs['id']}
+            if job_ids:
+                # Only the pairs that can matter this run, not every user's whole history
+                notified_stmt = text("""
+                    SELECT user_id::text, job_id::text FROM job_notifications
+                    WHERE user_id = ANY(CAST(:user_ids AS uuid[]))
+                    AND job_id = ANY(CAST(:job_ids AS uuid[]))
+                """)
+                notified = set(map(tuple, conn.execute(notified_stmt, {
+                    'user_ids': [str(user.id) for user in users],
+                    'job_ids': list(job_ids)
+                })))
+
+            for user, top_jobs in zip(users, results):
                 if not top_jobs.empty:
                     # Filter out already notified jobs
-                    new_jobs = []
-                    for _, job in top_jobs.iterrows():
-                        check_stmt = text("""
-                            SELECT 1 FROM job_notifications 
-                            WHERE user_id = :user_id AND job_id = :job_id
-                        """)
-                        result = conn.execute(check_stmt, {
-                            'user_id': user.id,
-                            'job_id': job['id']
-                        })
-                        if not result.fetchone():
-                            new_jobs.append(job)
+                    new_jobs = [job for _, job in top_jobs.iterrows()
+                                if (str(user.id), str(job['id'])) not in notified]
                     
                     if new_jobs:
                         # Convert user row to dict for updated email function
@@ -230,16 +355,15 @@ class UserManager:
                         self._send_job_notification_email(user_dict, new_jobs)
                         
                         # Mark jobs as notified
-                        for job in new_jobs:
-                            notify_stmt = text("""
-                                INSERT INTO job_notifications (user_id, job_id)
-                                VALUES (:user_id, :job_id)
-                                ON CONFLICT (user_id, job_id) DO NOTHING
-                            """)
-                            conn.execute(notify_stmt, {
-                                'user_id': user.id,
-                                'job_id': job['id']
-                            })
+                        notify_stmt = text("""
+                            INSERT INTO job_notifications (user_id, job_id)
+                            VALUES (:user_id, :job_id)
+                            ON CONFLICT (user_id, job_id) DO NOTHING
+                        """)
+                        conn.execute(notify_stmt, [
+                            {'user_id': user.id, 'job_id': job['id']}
+                            for job in new_jobs
+                        ])
             
             conn.commit()
 
@@ -32,4 +32,12 @@ CREATE TABLE IF NOT EXISTS job_notifications (
 );
 
 -- Only essential index for OAuth lookup
-CREATE INDEX IF NOT EXISTS idx_users_google_id ON users(google_id);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_users_google_id ON users(google_id);
+-- Profile embedding: resume text plus stated preferences, embedded once when
+-- either changes and used as the query vector for personalized searches.
+-- profile_hash is the md5 of the embedded text (see user_manager.profile_text)
+ALTER TABLE users ADD COLUMN IF NOT EXISTS resume_text TEXT;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS profile_embedding vector(768);
+ALTER TABLE users ADD COLUMN IF NOT EXISTS profile_embedding_model VARCHAR(100);
+ALTER TABLE users ADD COLUMN IF NOT EXISTS profile_hash CHAR(32);
+ALTER TABLE users ADD COLUMN IF NOT EXISTS profile_updated_at TIMESTAMP WITHOUT TIME ZONE;
@@ -0,0 +1,209 @@
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import text
+import config
+from db import get_engine
+from vector_storage import EMBEDDING_DIM
+
+# Rows committed slightly out of updated_at order are caught by re-reading this window
+SYNC_OVERLAP = timedelta(minutes=5)
+
+
+class MmapVectorIndex:
+    """Normalized job embeddings in a memory-mapped matrix, searched with one matmul"""
+
+    # <path>.meta.json names the current generation of <path>.<gen>.vectors.npy and
+    # <path>.<gen>.ids.npy; writers publish a generation atomically and every app
+    # process maps the same pages.
+
+    def __init__(self, path=None, dtype=None):
+        self.path = path or config.VECTOR_INDEX_PATH
+        self.dtype = np.dtype(dtype or config.VECTOR_INDEX_DTYPE)
+        self.meta_path = f"{self.path}.meta.json"
+        self.vectors = None
+        self.ids = None
+        self.generation = None
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+
+    def _files(self, generation):
+        return f"{self.path}.{generation}.vectors.npy", f"{self.path}.{generation}.ids.npy"
+
+    def _read_meta(self):
+        try:
+            with open(self.meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, force=False):
+        """Map the current generation; cheap no-op when nothing changed"""
+        with self._lock:
+            if not force and time.monotonic() - self._checked_at < config.VECTOR_INDEX_RELOAD_SECONDS:
+                return self.vectors is not None
+            self._checked_at = time.monotonic()
+            meta = self._read_meta()
+            if not meta or meta.get("model") != config.EMBEDDING_MODEL:
+                # Vectors from another model would rank queries wrongly; search falls back to SQL
+                self.vectors = self.ids = self.generation = None
+                return False
+            if meta["generation"] != self.generation:
+                vectors_file, ids_file = self._files(meta["generation"])
+                self.vectors = np.load(vectors_file, mmap_mode='r')
+                self.ids = np.load(ids_file, mmap_mode='r')
+                self.generation = meta["generation"]
+            return True
+
+    def search(self, queries, k):
+        """Top-k (ids, cosine scores) for each query vector"""
+        self.load()
+        # One consistent generation for the whole search; load() may swap the arrays meanwhile
+        with self._lock:
+            vectors, ids = self.vectors, self.ids
+        if vectors is None or not len(ids) or not len(queries):
+            return [(np.array([], dtype=str), np.array([], dtype=np.float32)) for _ in queries]
+        q = np.array(queries, dtype=np.float32)
+        q /= np.linalg.norm(q, axis=1, keepdims=True) + 1e-12
+
+        if vectors.dtype == np.float32:
+            scores = vectors @ q.T
+        else:
+            # float16 matmul has no BLAS path; upcast in chunks
+            scores = np.empty((len(vectors), len(q)), dtype=np.float32)
+            for start in range(0, len(vectors), 16384):
+                chunk = np.asarray(vectors[start:start + 16384], dtype=np.float32)
+                scores[start:start + len(chunk)] = chunk @ q.T
+
+        k = min(k, len(ids))
+        results = []
+        for column in scores.T:
+            top = np.argpartition(-column, k - 1)[:k]
+            top = top[np.argsort(-column[top])]
+            results.append((ids[top].astype(str), column[top]))
+        return results
+
+    def sync(self, engine, full=False):
+        """Export new or re-embedded rows since the last sync and publish a new generation"""
+        meta = self._read_meta()
+        since = None
+        if meta and meta.get("model") != config.EMBEDDING_MODEL:
+            # EMBEDDING_MODEL changed (e.g. after a promote, which keeps updated_at): re-export everything
+            print(f"Vector index was built for {meta.get('model')}; rebuilding for {config.EMBEDDING_MODEL}")
+            full = True
+        if meta and not full:
+            since = datetime.fromisoformat(meta["synced_until"]) - SYNC_OVERLAP
+
+        query = """
+            SELECT id::text, embedding::real[], updated_at FROM jobs
+            WHERE embedding IS NOT NULL AND embedding_model = :model
+        """
+        params = {"model": config.EMBEDDING_MODEL}
+        if since is not None:
+            query += " AND updated_at > :since"
+            params["since"] = since
+
+        existing = set()
+        if since is not None:
+            self.load(force=True)
+            existing = set(self.ids.astype(str))
+            previous_until = since + SYNC_OVERLAP
+
+        new_ids, new_vectors = [], []
+        synced_until = previous_until if since is not None else None
+        with engine.connect().execution_options(stream_results=True) as conn:
+            for row in conn.execute(text(query), params):
+                # Rows re-read from the overlap window that are already indexed are skipped
+                if since is not None and row[2] <= previous_until and row[0] in existing:
+                    continue
+                new_ids.append(row[0])
+                new_vectors.append(row[1])
+                if synced_until is None or row[2] > synced_until:
+                    synced_until = row[2]
+
+        if since is not None:
+            if not new_ids:
+                return 0
+            keep = ~np.isin(self.ids.astype(str), new_ids)
+            ids = np.concatenate([self.ids[keep].astype('S36'), np.array(new_ids, dtype='S36')])
+            vectors = np.concatenate([np.asarray(self.vectors[keep], dtype=np.float32), self._normalize(new_vectors)])
+        else:
+            ids = np.array(new_ids, dtype='S36')
+            vectors = self._normalize(new_vectors)
+
+        generation = int(time.time() * 1000)
+        vectors_file, ids_file = self._files(generation)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        np.save(vectors_file, vectors.astype(self.dtype))
+        np.save(ids_file, ids)
+        tmp = f"{self.meta_path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({
+                "generation": generation,
+                "count": len(ids),
+                "dtype": self.dtype.name,
+                "model": config.EMBEDDING_MODEL,
+                "synced_until": (synced_until.isoformat() if synced_until else
+                                 (meta or {}).get("synced_until", "1970-01-01T00:00:00"))
+            }, f)
+        os.replace(tmp, self.meta_path)
+        self._cleanup(keep=(generation, meta["generation"] if meta else None))
+        print(f"Vector index: {len(new_ids)} rows synced, {len(ids)} total (generation {generation})")
+        return len(new_ids)
+
+    def _normalize(self, vectors):
+        if not vectors:
+            return np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        matrix = np.asarray(vectors, dtype=np.float32)
+        return matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12)
+
+    def _cleanup(self, keep):
+        """Remove old generations; files still mapped elsewhere (Windows) are left for next time"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        prefix = os.path.basename(self.path) + "."
+        for name in os.listdir(directory):
+            if not name.startswith(prefix) or not name.endswith(".npy"):
+                continue
+            generation = name[len(prefix):].split(".")[0]
+            if generation.isdigit() and int(generation) not in keep:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+
+
+_default_index = None
+
+
+def get_index():
+    """Process-wide index, or None when VECTOR_INDEX_PATH is not configured"""
+    global _default_index
+    if not config.VECTOR_INDEX_PATH:
+        return None
+    if _default_index is None:
+        _default_index = MmapVectorIndex()
+    return _default_index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Memory-mapped job vector index')
+    parser.add_argument('command', choices=['sync', 'rebuild', 'bench'])
+    parser.add_argument('--queries', type=int, default=100)
+    args = parser.parse_args()
+
+    engine = get_engine(statement_timeout=0)  # full exports run long
+    index = MmapVectorIndex()
+    if args.command in ('sync', 'rebuild'):
+        index.sync(engine, full=args.command == 'rebuild')
+    else:
+        index.load(force=True)
+        queries = np.asarray(index.vectors[:args.queries], dtype=np.float32)
+        start = time.perf_counter()
+        for q in queries:
+            index.search([q], 60)
+        elapsed = (time.perf_counter() - start) * 1000 / max(len(queries), 1)
+        print(f"{len(index.ids)} vectors ({index.vectors.dtype}): {elapsed:.2f} ms/query")
@@ -0,0 +1,255 @@
+import argparse
+import math
+import time
+from sqlalchemy import text
+import config
+from db import get_engine
+
+EMBEDDING_DIM = 768
+
+# ANN storage layouts. The float32 `embedding` column stays the source of truth;
+# halfvec/binary are expression indexes over it, so the exact re-rank is free.
+STORAGE_TYPES = {
+    'vector': {
+        'expression': 'embedding',
+        'query': f'CAST(:query_embedding AS vector({EMBEDDING_DIM}))',
+        'operator': '<=>',
+        'opclass': 'vector_cosine_ops',
+        'index': 'idx_jobs_embedding',
+    },
+    'halfvec': {
+        'expression': f'(embedding::halfvec({EMBEDDING_DIM}))',
+        'query': f'CAST(:query_embedding AS halfvec({EMBEDDING_DIM}))',
+        'operator': '<=>',
+        'opclass': 'halfvec_cosine_ops',
+        'index': 'idx_jobs_embedding_halfvec',
+    },
+    'binary': {
+        'expression': f'(binary_quantize(embedding)::bit({EMBEDDING_DIM}))',
+        'query': f'binary_quantize(CAST(:query_embedding AS vector({EMBEDDING_DIM})))',
+        'operator': '<~>',
+        'opclass': 'bit_hamming_ops',
+        'index': 'idx_jobs_embedding_binary',
+    },
+}
+
+EXACT_SCORE = f"1 - (embedding <=> CAST(:query_embedding AS vector({EMBEDDING_DIM})))"
+
+
+def ann_order(storage, query_embedding=':query_embedding'):
+    """ORDER BY expression that matches the ANN index for a storage type"""
+    # query_embedding may name a column instead of the bind parameter (batched searches)
+    spec = STORAGE_TYPES[storage]
+    return f"{spec['expression']} {spec['operator']} {spec['query'].replace(':query_embedding', query_embedding)}"
+
+
+def rerank_sql(storage, columns, where_str):
+    """Quantized ANN candidate scan followed by an exact float32 re-rank"""
+    return f"""
+        WITH candidates AS (
+            SELECT id FROM jobs
+            WHERE {where_str}
+            ORDER BY {ann_order(storage)}
+            LIMIT :candidates
+        )
+        SELECT {columns},
+               {EXACT_SCORE} as vector_score
+        FROM jobs
+        JOIN candidates USING (id)
+        ORDER BY vector_score DESC
+        LIMIT :limit
+    """
+
+
+SEARCH_PARAMS_SQL = "SELECT set_config('ivfflat.probes', :probes, true), set_config('hnsw.ef_search', :ef_search, true)"
+
+
+def search_params(probes=None, ef_search=None):
+    return {
+        "probes": str(probes or config.IVFFLAT_PROBES),
+        "ef_search": str(ef_search or config.HNSW_EF_SEARCH)
+    }
+
+
+def apply_search_params(conn, probes=None, ef_search=None):
+    """Set ivfflat.probes / hnsw.ef_search for the current transaction"""
+    conn.execute(text(SEARCH_PARAMS_SQL), search_params(probes, ef_search))
+
+
+def embedded_rows(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT COUNT(*) FROM jobs WHERE embedding IS NOT NULL")).scalar()
+
+
+def ivfflat_lists(rows):
+    """pgvector guidance: rows / 1000 lists up to 1M rows, sqrt(rows) beyond"""
+    if rows <= 1_000_000:
+        return max(1, rows // 1000)
+    return int(math.sqrt(rows))
+
+
+def index_options(method, rows):
+    if method == 'ivfflat':
+        return f"WITH (lists = {ivfflat_lists(rows)})"
+    return f"WITH (m = {config.HNSW_M}, ef_construction = {config.HNSW_EF_CONSTRUCTION})"
+
+
+def create_index(engine, storage, method=None, name=None):
+    """Build the ANN expression index for a storage type without blocking writes"""
+    method = method or config.ANN_INDEX_METHOD
+    spec = STORAGE_TYPES[storage]
+    options = index_options(method, embedded_rows(engine))
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS {name or spec['index']}
+            ON jobs USING {method} ({spec['expression']} {spec['opclass']}) {options}
+        """))
+
+
+def rebuild_index(engine, storage='vector', method=None):
+    """Build a freshly sized index alongside the old one, then swap them"""
+    method = method or config.ANN_INDEX_METHOD
+    spec = STORAGE_TYPES[storage]
+    rows = embedded_rows(engine)
+    new_name = f"{spec['index']}_new"
+    print(f"Building {method} index on {rows} rows ({index_options(method, rows)})...")
+    start = time.monotonic()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {new_name}"))
+    create_index(engine, storage, method, name=new_name)
+    # Swap in one transaction so searches always see an ANN index; DROP INDEX needs an
+    # exclusive lock on jobs, held only for the swap and not waited on for long
+    with engine.begin() as conn:
+        conn.execute(text("SET LOCAL lock_timeout = '10s'"))
+        conn.execute(text(f"DROP INDEX IF EXISTS {spec['index']}"))
+        conn.execute(text(f"ALTER INDEX {new_name} RENAME TO {spec['index']}"))
+    print(f"OK {spec['index']} rebuilt in {time.monotonic() - start:.1f}s")
+
+
+def index_sizes(engine):
+    """Size in bytes of every embedding index that exists"""
+    sizes = {}
+    with engine.connect() as conn:
+        for storage, spec in STORAGE_TYPES.items():
+            row = conn.execute(
+                text("SELECT pg_relation_size(to_regclass(:name))"),
+                {"name": spec['index']}
+            ).fetchone()
+            if row and row[0] is not None:
+                sizes[storage] = row[0]
+    return sizes
+
+
+def migrate(engine, storage, drop_float_index=False):
+    """Create the quantized index and optionally drop the float32 one"""
+    print(f"Building {storage} index...")
+    start = time.monotonic()
+    create_index(engine, storage)
+    print(f"OK {STORAGE_TYPES[storage]['index']} built in {time.monotonic() - start:.1f}s")
+
+    if drop_float_index and storage != 'vector':
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {STORAGE_TYPES['vector']['index']}"))
+        print("OK float32 index dropped")
+
+    for name, size in index_sizes(engine).items():
+        print(f"  {name:<8} {size / 1024 / 1024:.1f} MB")
+    print(f"Set EMBEDDING_STORAGE={storage} to use it for search")
+
+
+def _exact_top_k(conn, query_embedding, k):
+    conn.execute(text("SET LOCAL enable_indexscan = off"))
+    result = conn.execute(text(f"""
+        SELECT id FROM jobs
+        WHERE embedding IS NOT NULL
+        ORDER BY {EXACT_SCORE} DESC
+        LIMIT :limit
+    """), {"query_embedding": query_embedding, "limit": k})
+    return [row[0] for row in result]
+
+
+def _storage_top_k(conn, storage, query_embedding, k, rerank_multiplier, probes=None, ef_search=None):
+    apply_search_params(conn, probes, ef_search)
+    if storage == 'vector':
+        stmt = text(f"""
+            SELECT id FROM jobs
+            WHERE embedding IS NOT NULL
+            ORDER BY {ann_order(storage)}
+            LIMIT :limit
+        """)
+    else:
+        stmt = text(rerank_sql(storage, "id", "embedding IS NOT NULL"))
+    result = conn.execute(stmt, {
+        "query_embedding": query_embedding,
+        "limit": k,
+        "candidates": k * rerank_multiplier
+    })
+    return [row[0] for row in result]
+
+
+def compare(engine, samples=50, k=20, rerank_multiplier=None, probes=None, ef_search=None):
+    """Report recall@k against exact search and latency for each indexed storage type"""
+    rerank_multiplier = rerank_multiplier or config.RERANK_MULTIPLIER
+    with engine.connect() as conn:
+        queries = [row[0] for row in conn.execute(text("""
+            SELECT embedding::text FROM jobs
+            WHERE embedding IS NOT NULL
+            ORDER BY random()
+            LIMIT :samples
+        """), {"samples": samples})]
+
+    if not queries:
+        print("No embedded jobs to sample")
+        return
+
+    sizes = index_sizes(engine)
+    print(f"probes={probes or config.IVFFLAT_PROBES} ef_search={ef_search or config.HNSW_EF_SEARCH}")
+    print(f"{'storage':<8} {'index MB':>9} {'recall@' + str(k):>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for storage in STORAGE_TYPES:
+        if storage not in sizes:
+            continue
+        recalls, latencies = [], []
+        for query_embedding in queries:
+            with engine.begin() as conn:
+                exact = set(_exact_top_k(conn, query_embedding, k))
+            with engine.connect() as conn:
+                start = time.monotonic()
+                found = _storage_top_k(conn, storage, query_embedding, k, rerank_multiplier, probes, ef_search)
+                latencies.append((time.monotonic() - start) * 1000)
+            recalls.append(len(exact.intersection(found)) / max(len(exact), 1))
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+        print(f"{storage:<8} {sizes[storage] / 1024 / 1024:>9.1f} "
+              f"{sum(recalls) / len(recalls):>10.3f} {p50:>8.1f} {p95:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Quantized embedding storage')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    migrate_parser = subparsers.add_parser('migrate', help='Build a quantized ANN index')
+    migrate_parser.add_argument('--storage', choices=['halfvec', 'binary'], default='halfvec')
+    migrate_parser.add_argument('--drop-float-index', action='store_true', help='Drop the float32 index afterwards')
+
+    compare_parser = subparsers.add_parser('compare', help='Compare recall and latency of indexed storage types')
+    compare_parser.add_argument('--samples', type=int, default=50)
+    compare_parser.add_argument('--k', type=int, default=20)
+    compare_parser.add_argument('--rerank-multiplier', type=int, default=None)
+    compare_parser.add_argument('--probes', type=int, default=None, help='ivfflat.probes (default IVFFLAT_PROBES)')
+    compare_parser.add_argument('--ef-search', type=int, default=None, help='hnsw.ef_search (default HNSW_EF_SEARCH)')
+
+    index_parser = subparsers.add_parser('build-index', help='(Re)build an ANN index sized to the current row count')
+    index_parser.add_argument('--storage', choices=list(STORAGE_TYPES), default='vector')
+    index_parser.add_argument('--method', choices=['hnsw', 'ivfflat'], default=None)
+
+    args = parser.parse_args()
+    engine = get_engine(statement_timeout=0)  # index builds run long
+
+    if args.command == 'migrate':
+        migrate(engine, args.storage, args.drop_float_index)
+    elif args.command == 'build-index':
+        rebuild_index(engine, args.storage, args.method)
+        compare(engine, k=20)
+    else:
+        compare(engine, args.samples, args.k, args.rerank_multiplier, args.probes, args.ef_search)